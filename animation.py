@@ -0,0 +1,309 @@
+"""Animations des personnages : clips décrits par feuille, atlas partagé, avance par lots.
+
+Chaque feuille de sprites a, à côté d'elle, un petit descripteur JSON
+(Player.png -> Player.anim) qui nomme ses personnages et leurs clips :
+images (cases de la grille de la feuille), durée de chaque image et mode de
+lecture (« loop », « once » ou « pingpong ») :
+
+    {
+      "frame_size": [40, 48],
+      "grid": [48, 48],
+      "characters": {
+        "joueur": {
+          "idle_down": {"frames": [[0, 0]]},
+          "walk_down": {"frames": [[0, 0], [1, 0], [2, 0]], "duration": 0.11, "mode": "pingpong"}
+        }
+      }
+    }
+
+Les images de toutes les feuilles sont copiées dans un seul atlas partagé :
+un clip n'est plus qu'une suite d'indices d'images de l'atlas et de temps de
+fin. L'état d'animation des entités (personnage, clip, temps écoulé dans le
+clip, image affichée) vit dans l'EntityStore ; ``advance`` choisit le clip
+de chaque entité (marche ou arrêt, direction) et en déduit l'image à partir
+du temps écoulé, en une passe vectorisée par pas pour toutes les entités.
+"""
+import json
+import os
+
+import numpy as np
+import pygame
+
+from sprites import load_sheet
+
+DIRECTIONS = ('down', 'left', 'right', 'up')  # Ordre des directions de l'EntityStore
+LOOP, ONCE = 0, 1
+DEFAULT_DURATION = 1 / 9  # Secondes par image
+
+
+def descriptor_path(sheet):
+    return os.path.splitext(sheet)[0] + ".anim"
+
+
+def character_layout(frame_size):
+    """Descripteur d'une feuille sans .anim : 3 images par direction, une ligne par direction"""
+    clips = {}
+    for row, direction in enumerate(DIRECTIONS):
+        clips[f"walk_{direction}"] = {"frames": [[column, row] for column in range(3)]}
+    return {"frame_size": list(frame_size), "characters": {"": clips}}
+
+
+def read_descriptor(sheet, frame_size=None):
+    """Lit le descripteur d'une feuille (par défaut, la disposition à 4 directions)"""
+    try:
+        with open(descriptor_path(sheet), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if frame_size is None:
+            raise
+        return character_layout(frame_size)
+
+
+class Atlas:
+    """Une seule surface pour les images de toutes les feuilles, rangées en étagères.
+
+    L'atlas double de hauteur quand il est plein ; ``images`` est alors
+    refaite sur la nouvelle surface (les indices ne changent pas).
+    """
+
+    def __init__(self, width=512, padding=1):
+        self.width = width
+        self.padding = padding
+        self.surface = pygame.Surface((width, 0), pygame.SRCALPHA)
+        self.rects = []
+        self.images = []
+        self._x = self._y = self._shelf = 0
+
+    def add(self, sheet, area, colorkey=None):
+        """Copie la zone ``area`` de ``sheet`` dans l'atlas et renvoie l'indice de l'image"""
+        w, h = area[2], area[3]
+        if self._x + w > self.width:
+            # Étagère suivante
+            self._x, self._y, self._shelf = 0, self._y + self._shelf + self.padding, 0
+        rect = pygame.Rect(self._x, self._y, w, h)
+        self._x += w + self.padding
+        self._shelf = max(self._shelf, h)
+        if rect.bottom > self.surface.get_height():
+            self._resize(max(rect.bottom, 2 * self.surface.get_height()))
+
+        self.surface.fill((0, 0, 0, 0), rect)
+        self.surface.blit(sheet, rect, area)
+        if colorkey is not None:
+            # Colorkey intégré à la transparence, une fois pour toutes
+            pixels = pygame.surfarray.pixels3d(self.surface)[rect.left:rect.right, rect.top:rect.bottom]
+            alpha = pygame.surfarray.pixels_alpha(self.surface)[rect.left:rect.right, rect.top:rect.bottom]
+            alpha[(pixels == colorkey).all(axis=2)] = 0
+            del pixels, alpha  # Libère le verrou de la surface
+        self.rects.append(rect)
+        self.images.append(self.surface.subsurface(rect))
+        return len(self.images) - 1
+
+    def _resize(self, height):
+        surface = pygame.Surface((self.width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        surface.fill((0, 0, 0, 0))
+        surface.blit(self.surface, (0, 0))
+        self.surface = surface
+        self.images = [surface.subsurface(rect) for rect in self.rects]
+
+
+class Character:
+    """Clips d'un personnage (ou d'un objet) d'une feuille : nom -> identifiant de clip"""
+
+    def __init__(self, library, index, name, clips):
+        self.library = library
+        self.index = index  # Ligne de la table de choix des clips
+        self.name = name
+        self.clips = clips
+
+    def clip(self, name):
+        """Identifiant du clip ``name`` ou de son remplaçant (voir ``AnimationLibrary.fallbacks``)"""
+        for candidate in self.library.fallbacks(name):
+            clip = self.clips.get(candidate)
+            if clip is not None:
+                return clip
+        return next(iter(self.clips.values()))
+
+    def images(self, name):
+        """Images de l'atlas du clip ``name``"""
+        library = self.library
+        return [library.atlas.images[i] for i in library.clip_images[self.clip(name)]]
+
+    @property
+    def image(self):
+        """Première image à l'arrêt, face au joueur"""
+        return self.images("idle_down")[0]
+
+    def attach(self, store, entity_id):
+        """Anime l'entité ``entity_id`` avec ce personnage (clip choisi au prochain ``advance``)"""
+        store.character[entity_id] = self.index
+        store.clip[entity_id] = -1
+        store.clip_time[entity_id] = 0
+        store.frame_end[entity_id] = 0
+        store.image[entity_id] = self.library.clip_images[self.clip("idle_down")][0]
+
+
+class AnimationLibrary:
+    """Personnages de toutes les feuilles chargées, leurs clips et l'atlas partagé"""
+
+    def __init__(self, atlas_width=512):
+        self.atlas = Atlas(atlas_width)
+        self.characters = []
+        self._sheets = {}         # feuille -> {nom: Character}
+        self.clip_images = []     # clip -> indices des images dans l'atlas
+        self.clip_durations = []  # clip -> durée de chaque image
+        self.clip_modes = []
+        self._tables = None
+
+    def load(self, sheet, frame_size=None):
+        """Personnages d'une feuille (lue et rangée dans l'atlas une seule fois)"""
+        characters = self._sheets.get(sheet)
+        if characters is not None:
+            return characters
+
+        descriptor = read_descriptor(sheet, frame_size)
+        image = load_sheet(sheet)
+        fw, fh = descriptor["frame_size"]
+        gw, gh = descriptor.get("grid", (fw, fh))
+        colorkey = descriptor.get("colorkey", (0, 0, 0))
+        cells = {}  # Une image partagée par tous les clips qui utilisent la même case
+
+        characters = {}
+        for name, clips in descriptor["characters"].items():
+            ids = {}
+            for clip_name, clip in clips.items():
+                frames = []
+                for column, row in clip["frames"]:
+                    if (column, row) not in cells:
+                        cells[column, row] = self.atlas.add(image, (column * gw, row * gh, fw, fh), colorkey)
+                    frames.append(cells[column, row])
+                duration = clip.get("duration", DEFAULT_DURATION)
+                durations = list(duration) if isinstance(duration, list) else [duration] * len(frames)
+                ids[clip_name] = self._add_clip(frames, durations, clip.get("mode", "loop"))
+            # Sans clip d'arrêt, le personnage s'arrête sur la première image de sa marche
+            for clip_name in list(ids):
+                if clip_name.startswith("walk") and "idle" + clip_name[4:] not in ids:
+                    ids["idle" + clip_name[4:]] = self._add_clip(self.clip_images[ids[clip_name]][:1], [1.0], "once")
+            character = Character(self, len(self.characters), name, ids)
+            self.characters.append(character)
+            characters[name] = character
+        self._sheets[sheet] = characters
+        self._tables = None
+        return characters
+
+    def character(self, sheet, name=None, frame_size=None):
+        """Personnage ``name`` d'une feuille (le premier si ``name`` est None)"""
+        characters = self.load(sheet, frame_size)
+        if name is None:
+            return next(iter(characters.values()))
+        return characters[name]
+
+    def _add_clip(self, frames, durations, mode):
+        if mode == "pingpong":
+            # Aller-retour sans répéter les extrémités : 0 1 2 1 0 1 2 1...
+            frames = frames + frames[-2:0:-1]
+            durations = durations + durations[-2:0:-1]
+        self.clip_images.append(frames)
+        self.clip_durations.append(durations)
+        self.clip_modes.append(ONCE if mode == "once" else LOOP)
+        return len(self.clip_images) - 1
+
+    @staticmethod
+    def fallbacks(name):
+        # walk_left -> walk -> idle_left -> idle
+        state, _, direction = name.partition("_")
+        names = [name, state]
+        if direction:
+            names += [f"idle_{direction}", "idle"]
+        return names
+
+    def tables(self):
+        """Tables NumPy des clips, refaites quand une feuille est chargée"""
+        if self._tables is None:
+            # Temps de fin de chaque image, décalés clip après clip : le tableau
+            # entier est croissant et un seul searchsorted sert à tous les clips.
+            # Un dernier clip d'une image sert aux entités sans personnage (-1).
+            durations = self.clip_durations + [[1.0]]
+            modes = self.clip_modes + [LOOP]
+            base, total, clamp, last, hold = [], [], [], [], []
+            ends = []
+            offset = 0.0
+            for frames, mode in zip(durations, modes):
+                base.append(offset)
+                for duration in frames:
+                    offset += duration
+                    ends.append(offset)
+                total.append(offset - base[-1])
+                last.append(len(ends) - 1)
+                # Clip lu une fois : le temps s'arrête juste avant la fin, sur la dernière image
+                # (tenue, comme l'image unique d'un clip)
+                clamp.append(np.inf if mode == LOOP else np.nextafter(total[-1], 0))
+                hold.append(last[-1] if mode != LOOP or len(frames) == 1 else -1)
+            # Clip de chaque personnage selon (en marche, direction), à plat :
+            # indice (personnage * 2 + en marche) * 4 + direction
+            select = np.full((len(self.characters) + 1, 2, len(DIRECTIONS)), len(durations) - 1, dtype=np.int16)
+            for character in self.characters:
+                for moving, state in enumerate(("idle", "walk")):
+                    for d, direction in enumerate(DIRECTIONS):
+                        select[character.index, moving, d] = character.clip(f"{state}_{direction}")
+            images = [i for frames in self.clip_images for i in frames] + [0]
+            self._tables = {
+                "select": select.ravel(),
+                "base": np.array(base),
+                "total": np.array(total),
+                "clamp": np.array(clamp),
+                "last": np.array(last),
+                "hold": np.array(hold),
+                "ends": np.array(ends),
+                "images": np.array(images, dtype=np.int32),
+            }
+        return self._tables
+
+    def advance(self, store, dt):
+        """Avance d'un pas dt l'animation de toutes les entités du stockage.
+
+        Toutes les entités voient leur clip choisi et leur temps avancer ;
+        seules celles qui changent de clip ou dont l'image en cours est finie
+        (une sur sept environ à 60 pas par seconde) cherchent leur nouvelle image.
+        """
+        n = store.count
+        t = self.tables()
+        moving = (store.vx[:n] != 0) | (store.vy[:n] != 0)
+        moving |= store.walking[:n]
+        # Personnage -1 : indices négatifs, soit la dernière ligne de la table (clip sans effet)
+        key = store.character[:n] * (2 * len(DIRECTIONS)) + moving.view(np.int8) * len(DIRECTIONS)
+        key += store.direction[:n]
+        clip = t["select"].take(key)
+
+        time = store.clip_time[:n]
+        time += dt
+        changed = clip != store.clip[:n]
+        store.clip[:n] = clip
+        ids = np.flatnonzero(changed | (time >= store.frame_end[:n]))
+        if not len(ids):
+            return
+
+        # Nouveau clip : lecture depuis le début
+        clip = clip[ids]
+        now = np.where(changed[ids], 0.0, time[ids])
+        base = t["base"][clip]
+        now = np.fmod(np.minimum(now, t["clamp"][clip]), t["total"][clip])
+        frame = np.minimum(np.searchsorted(t["ends"], base + now, side="right"), t["last"][clip])
+        end = t["ends"][frame] - base
+        end[frame == t["hold"][clip]] = np.inf  # Dernière image d'un clip lu une fois : tenue
+
+        store.clip_time[ids] = now
+        store.frame_end[ids] = end
+        store.image[ids] = t["images"][frame]
+
+
+_library = None
+
+
+def library():
+    """Bibliothèque d'animations partagée par tout le processus (comme les caches de sprites.py)"""
+    global _library
+    if _library is None:
+        _library = AnimationLibrary()
+    return _library
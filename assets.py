@@ -0,0 +1,54 @@
+"""Chargement des ressources en arrière-plan.
+
+Images et niveaux sont lus et décodés par des threads de travail ;
+chaque demande renvoie un Future et n'est faite qu'une fois. La conversion
+des images au format de l'écran, qui doit avoir lieu dans le thread
+principal, est faite à leur première utilisation. Les musiques ne passent
+pas par ici : pygame.mixer.music les lit en flux depuis le disque.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+
+class AssetManager:
+    """Chargements asynchrones, indexés par (type, chemin)"""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="assets")
+        self._futures = {}
+        self._images = {}
+
+    def submit(self, key, func, *args):
+        """Lance ``func(*args)`` en arrière-plan, sauf si ``key`` a déjà été demandée"""
+        future = self._futures.get(key)
+        if future is None:
+            future = self._executor.submit(func, *args)
+            self._futures[key] = future
+        return future
+
+    def load_image(self, path):
+        return self.submit(("image", path), pygame.image.load, path)
+
+    def load_level(self, registry, filename):
+        return self.submit(("level", filename), registry.get, filename)
+
+    def image(self, path, alpha=False):
+        """Image prête à l'affichage, en attendant la fin de son chargement si besoin"""
+        image = self._images.get(path)
+        if image is None:
+            image = self.load_image(path).result()
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha() if alpha else image.convert()
+            self._images[path] = image
+        return image
+
+    def progress(self, futures=None):
+        """Fraction des chargements terminés (tous, ou ceux de ``futures``)"""
+        futures = list(self._futures.values()) if futures is None else futures
+        if not futures:
+            return 1.0
+        return sum(future.done() for future in futures) / len(futures)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
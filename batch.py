@@ -0,0 +1,247 @@
+"""Simulations en lot pour l'équilibrage des niveaux.
+
+Lance de nombreuses parties sans fenêtre, réparties sur tous les cœurs,
+jouées par des agents (chemin le plus court avec écarts aléatoires, marche
+au hasard ou script fixe), et résume taux de réussite, temps jusqu'à
+l'objectif et nombre de collisions. Chaque processus garde son jeu et ses
+niveaux chargés d'une partie à l'autre : les tmx ne sont lus qu'une fois
+par processus.
+
+Exemple :
+    python batch.py --runs 200 --agent chemin --noise 0.1
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from headless import ScriptedKeys, parse_script, percentile, script_frames
+
+DIRECTION_KEYS = [["up"], ["down"], ["left"], ["right"], []]
+
+# État propre à chaque processus de travail
+_game = None
+_grids = {}
+
+
+class RandomAgent:
+    """Garde une direction (ou l'arrêt) tirée au hasard pendant quelques dixièmes de seconde"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.keys = ScriptedKeys()
+        self.remaining = 0
+
+    def __call__(self, game):
+        if self.remaining <= 0:
+            self.keys = ScriptedKeys(self.rng.choice(DIRECTION_KEYS))
+            self.remaining = self.rng.randint(10, 60)
+        self.remaining -= 1
+        return self.keys
+
+
+class ScriptAgent:
+    """Rejoue un script de touches (voir headless.py), en boucle"""
+
+    def __init__(self, script, frames):
+        self.states = script_frames(script, frames)
+        self.step = 0
+
+    def __call__(self, game):
+        state = self.states[min(self.step, len(self.states) - 1)]
+        self.step += 1
+        return state
+
+
+class PathAgent:
+    """Va au plus court vers la sortie de la carte (objectif, sinon portail).
+
+    Avec ``noise`` > 0, l'agent part de temps en temps dans une direction au
+    hasard, comme un joueur qui hésite ; il recalcule alors son chemin.
+    """
+
+    def __init__(self, rng, noise=0.0):
+        self.rng = rng
+        self.noise = noise
+        self.detour = RandomAgent(rng)
+        self.map = None
+        self.path = None
+
+    def plan(self, game):
+        self.map = game.current_map
+        level = game.level
+        if level.goals:
+            target = level.goals[0].center
+        elif level.portals:
+            target = level.portals[0].rect.center
+        else:
+            self.path = None
+            return
+        grid = navigation_grid(game)
+        # Les pieds peuvent toucher un mur épaissi : départ de la case libre la plus proche
+        start = grid.nearest_walkable(grid.cell_at(game.player.feet.center))
+        goal = grid.nearest_walkable(grid.cell_at(target))
+        cells = grid.find_path(start, goal) if start and goal else None
+        self.path = [grid.center(cell) for cell in cells] if cells else None
+
+    def __call__(self, game):
+        if self.detour.remaining > 0:
+            return self.detour(game)
+        if self.noise and self.rng.random() < self.noise / 30:
+            self.map = None  # Chemin à refaire après l'écart
+            return self.detour(game)
+        if game.current_map != self.map:
+            self.plan(game)
+        if not self.path:
+            self.map = None  # Nouvel essai après quelques pas au hasard
+            return self.detour(game)
+
+        # Étapes atteintes à un pas de déplacement près
+        tolerance = math.ceil(game.player.speed / game.sim_rate)
+        x, y = game.player.feet.center
+        while self.path and abs(self.path[0][0] - x) <= tolerance and abs(self.path[0][1] - y) <= tolerance:
+            self.path.pop(0)
+        if not self.path:
+            self.map = None
+            return ScriptedKeys()
+        dx, dy = self.path[0][0] - x, self.path[0][1] - y
+        if abs(dx) > tolerance:
+            return ScriptedKeys(["right" if dx > 0 else "left"])
+        return ScriptedKeys(["down" if dy > 0 else "up"])
+
+
+def navigation_grid(game):
+    """Grille de navigation du niveau courant, épaissie à la taille des pieds du joueur"""
+    grid = _grids.get(game.current_map)
+    if grid is None:
+        from navigation import NavGrid
+        grid = NavGrid.from_level(game.level, cell_size=4)
+        feet = game.player.feet
+        grid = grid.inflated(math.ceil(feet.width / 2 / 4), math.ceil(feet.height / 2 / 4))
+        _grids[game.current_map] = grid
+    return grid
+
+
+def init_worker(start_map, collision_mode):
+    global _game
+    from game import Game
+    _game = Game(collision_mode=collision_mode, headless=True, start_map=start_map, seed=0,
+                 deterministic=True)
+
+
+def simulate(task):
+    """Joue une partie depuis la carte de départ et renvoie son résultat"""
+    run, agent_name, seed, max_seconds, script, noise = task
+    game = _game
+    rng = random.Random(seed)
+    game.entities.rng = np.random.default_rng(seed)
+
+    # Retour au point de départ : les niveaux déjà analysés sont réutilisés
+    level = game.levels.get(game.start_map)
+    game.travel(game.start_map, level.spawn, offset=0)
+    start = game.sim_time
+    collisions = game.collision_count
+
+    if agent_name == "chemin":
+        agent = PathAgent(rng, noise)
+    elif agent_name == "hasard":
+        agent = RandomAgent(rng)
+    else:
+        agent = ScriptAgent(script, int(max_seconds * game.sim_rate))
+
+    dt = 1.0 / game.sim_rate
+    while not (game.game_over or game.level_completed) and game.sim_time - start < max_seconds:
+        game.player.save_location()
+        game.handle_input(dt, agent(game))
+        game.update(dt)
+
+    return {
+        "run": run,
+        "completed": game.level_completed,
+        "game_over": game.game_over,
+        "map": game.current_map,
+        "time": game.sim_time - start,
+        "level_time": game.sim_time - game.start_time,
+        "countdown": game.countdown_time,
+        "collisions": game.collision_count - collisions,
+    }
+
+
+def run_batch(runs, agent="chemin", processes=None, start_map="map.tmx", collision_mode="objets",
+              max_seconds=120, script=None, noise=0.0, seed=0):
+    """Répartit ``runs`` parties sur ``processes`` processus et renvoie leurs résultats"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    tasks = [(run, agent, seed + run, max_seconds, script, noise) for run in range(runs)]
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(start_map, collision_mode)) as pool:
+        chunksize = max(1, runs // (4 * (processes or os.cpu_count())))
+        results = list(pool.imap_unordered(simulate, tasks, chunksize))
+        # Fin normale des processus : SDL intercepte le SIGTERM envoyé par terminate()
+        pool.close()
+        pool.join()
+    return sorted(results, key=lambda result: result["run"])
+
+
+def report(results):
+    """Affiche le résumé des parties"""
+    runs = len(results)
+    completed = [r for r in results if r["completed"]]
+    game_over = sum(r["game_over"] for r in results)
+    timeouts = runs - len(completed) - game_over
+    print(f"parties            : {runs}")
+    print(f"réussites          : {len(completed)} ({100 * len(completed) / runs:.1f} %)")
+    print(f"temps écoulé       : {game_over}, abandons (durée max) : {timeouts}")
+
+    def summary(label, values, unit):
+        if values:
+            mean = sum(values) / len(values)
+            print(f"{label:<19}: moy {mean:7.2f}{unit}  p50 {percentile(values, 50):7.2f}{unit}"
+                  f"  p95 {percentile(values, 95):7.2f}{unit}")
+
+    summary("temps jusqu'au but", [r["time"] for r in completed], " s")
+    summary("temps sur le niveau", [r["level_time"] for r in completed], " s")
+    countdowns = {r["countdown"] for r in completed if r["countdown"] is not None}
+    for countdown in sorted(countdowns):
+        margins = [r["countdown"] - r["level_time"] for r in completed if r["countdown"] == countdown]
+        summary(f"marge ({countdown} s)", margins, " s")
+    summary("collisions", [r["collisions"] for r in results], "")
+    maps = {}
+    for r in results:
+        if not r["completed"]:
+            maps[r["map"]] = maps.get(r["map"], 0) + 1
+    if maps:
+        print("échecs par carte   : " + ", ".join(f"{name}: {count}" for name, count in sorted(maps.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=100, help="nombre de parties")
+    parser.add_argument("--agent", default="chemin", choices=("chemin", "hasard", "script"))
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="écarts aléatoires de l'agent « chemin » (par seconde)")
+    parser.add_argument("--script", default="right:60,down:60,left:60,up:60",
+                        help="touches:frames de l'agent « script »")
+    parser.add_argument("--map", default="map.tmx", help="carte de départ")
+    parser.add_argument("--collisions", default="objets", choices=("objets", "tuiles"))
+    parser.add_argument("--max-seconds", type=float, default=120, help="durée de jeu maximum par partie")
+    parser.add_argument("--processes", type=int, default=None, help="processus (défaut : un par cœur)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run_batch(args.runs, args.agent, args.processes, args.map, args.collisions,
+                        args.max_seconds, parse_script(args.script), args.noise, args.seed)
+    elapsed = time.perf_counter() - start
+    report(results)
+    print(f"{args.runs} parties en {elapsed:.1f} s ({args.processes or os.cpu_count()} processus)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,487 @@
+"""Mesures de performance du prototype.
+
+Utilisation : python benchmark.py [nom ...]
+Sans argument, tous les benchmarks sont lancés.
+"""
+import random
+import subprocess
+import sys
+import time
+
+import pygame
+
+from collisions import SpatialHash, sweep
+
+
+def timeit(func, repeat=5):
+    """Renvoie le meilleur temps d'exécution de ``func`` (en secondes)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def synthetic_walls(tiles=500, tile_size=16, count=20000, seed=0):
+    """Génère des murs aléatoires sur une carte de tiles x tiles tuiles"""
+    rng = random.Random(seed)
+    size = tiles * tile_size
+    walls = []
+    for _ in range(count):
+        w = rng.randint(1, 4) * tile_size
+        h = rng.randint(1, 4) * tile_size
+        walls.append(pygame.Rect(rng.randrange(0, size - w), rng.randrange(0, size - h), w, h))
+    return walls
+
+
+def bench_collisions():
+    """collidelist contre l'index spatial sur une carte de 500x500 tuiles"""
+    walls = synthetic_walls()
+    rng = random.Random(1)
+    size = 500 * 16
+    feet = [pygame.Rect(rng.randrange(0, size), rng.randrange(0, size), 20, 12) for _ in range(200)]
+
+    def linear():
+        for rect in feet:
+            rect.collidelist(walls) > -1
+
+    index = SpatialHash.from_rects(walls)
+
+    def hashed():
+        for rect in feet:
+            index.collide(rect)
+
+    # Les deux méthodes doivent donner le même résultat
+    assert [r.collidelist(walls) > -1 for r in feet] == [index.collide(r) for r in feet]
+
+    build = timeit(lambda: SpatialHash.from_rects(walls), repeat=1)
+    t_linear = timeit(linear)
+    t_hashed = timeit(hashed)
+    print(f"murs: {len(walls)}, sprites: {len(feet)}")
+    print(f"  construction index : {build * 1000:8.2f} ms")
+    print(f"  collidelist        : {t_linear * 1000:8.3f} ms / frame")
+    print(f"  index spatial      : {t_hashed * 1000:8.3f} ms / frame")
+    print(f"  gain               : x{t_linear / t_hashed:.1f}")
+
+
+def bench_movement(count=2000):
+    """Résolution des déplacements : test puis retour arrière contre balayage glissant"""
+    walls = synthetic_walls()
+    index = SpatialHash.from_rects(walls)
+    rng = random.Random(4)
+    size = 500 * 16
+    moves = [((rng.uniform(0, size), rng.uniform(0, size), 20, 12),
+              rng.uniform(-6, 6), rng.uniform(-6, 6)) for _ in range(count)]
+    feet = pygame.Rect(0, 0, 20, 12)
+
+    def move_back():
+        for (x, y, w, h), dx, dy in moves:
+            feet.topleft = (x + dx, y + dy)
+            if index.collide(feet):
+                feet.topleft = (x, y)
+
+    def swept():
+        for box, dx, dy in moves:
+            sweep(box, dx, dy, index)
+
+    t_back = timeit(move_back)
+    t_sweep = timeit(swept)
+    print(f"déplacements: {count}")
+    print(f"  retour arrière     : {count / t_back / 1e6:8.3f} M/s")
+    print(f"  balayage           : {count / t_sweep / 1e6:8.3f} M/s")
+
+
+def bench_entities(count=1000, steps=60):
+    """Déplacement et phase large de ``count`` pnj : boucle Python contre EntityStore"""
+    import numpy as np
+    from animation import AnimationLibrary
+    from entities import EntityStore, occupancy_grid
+
+    walls = synthetic_walls()
+    index = SpatialHash.from_rects(walls)
+    grid = occupancy_grid(index)
+    rng = random.Random(2)
+    size = 500 * 16
+    starts = [(rng.randrange(0, size), rng.randrange(0, size)) for _ in range(count)]
+    dt = 1 / 60
+
+    class Sprite:
+        def __init__(self, x, y):
+            self.position = [x, y]
+            self.velocity = [60, 0]
+            self.timer = 0
+            self.frame = 0
+            self.feet = pygame.Rect(0, 0, 15, 8)
+
+    sprites = [Sprite(x, y) for x, y in starts]
+
+    def loop():
+        for _ in range(steps):
+            for sprite in sprites:
+                sprite.position[0] += sprite.velocity[0] * dt
+                sprite.position[1] += sprite.velocity[1] * dt
+                sprite.timer += 9 * dt
+                if sprite.timer >= 1:
+                    sprite.timer -= 1
+                    sprite.frame = (sprite.frame + 1) % 3
+                sprite.feet.topleft = (sprite.position[0] + 8, sprite.position[1] + 24)
+                index.collide(sprite.feet)
+
+    store = EntityStore(capacity=count)
+    animations = AnimationLibrary()
+    character = animations.character("ressources/assets/pnjs/paul.png")
+    for x, y in starts:
+        character.attach(store, store.spawn(x, y, (31, 32), (15, 8), speed=60, ai=True))
+    store.set_direction(store.active_ids(), np.full(count, 2))
+
+    def batched():
+        for _ in range(steps):
+            store.step(dt)
+            animations.advance(store, dt)
+            store.broad_phase(index.cell_size, grid)
+
+    t_loop = timeit(loop, repeat=3)
+    t_batched = timeit(batched, repeat=3)
+    print(f"pnj: {count}, pas: {steps}")
+    print(f"  boucle Python      : {t_loop / steps * 1000:8.3f} ms / pas")
+    print(f"  EntityStore        : {t_batched / steps * 1000:8.3f} ms / pas")
+    print(f"  gain               : x{t_loop / t_batched:.1f}")
+
+
+def bench_paths(queries=200):
+    """A* sur une carte de 500x500 tuiles : premières recherches puis cache"""
+    from types import SimpleNamespace
+    from navigation import NavGrid, PathService
+
+    level = SimpleNamespace(map_data=SimpleNamespace(tile_size=(16, 16), map_size=(500, 500)),
+                            walls=synthetic_walls(count=8000), wall_bitmap=None, revision=0)
+    service = PathService()
+    service.set_level(level)
+    build = timeit(lambda: NavGrid.from_level(level), repeat=1)
+    rng = random.Random(3)
+    size = 500 * 16
+    pairs = [((rng.randrange(size), rng.randrange(size)), (rng.randrange(size), rng.randrange(size)))
+             for _ in range(queries)]
+
+    start = time.perf_counter()
+    found = sum(path is not None for path in service.request_many(pairs).result())
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    service.request_many(pairs).result()
+    cached = time.perf_counter() - start
+    service.shutdown()
+    print(f"requêtes: {queries}, chemins trouvés: {found}")
+    print(f"  grille             : {build * 1000:8.2f} ms")
+    print(f"  A*                 : {cold / queries * 1000:8.3f} ms / requête")
+    print(f"  cache              : {cached / queries * 1000:8.3f} ms / requête")
+
+
+def bench_triggers(triggers=2000, steps=20000):
+    """Volumes déclencheurs : test à chaque pas contre suivi par changement de case"""
+    from types import SimpleNamespace
+    from triggers import Trigger, TriggerSystem
+
+    index = SpatialHash.from_rects(synthetic_walls(count=8000))
+    for i, rect in enumerate(synthetic_walls(count=triggers, seed=5)):
+        index.add(rect, "trigger", Trigger(f"t{i}", "coffre", rect))
+
+    # Un joueur qui marche à 3 pixels par pas en changeant de direction de temps en temps
+    rng = random.Random(6)
+    feet = []
+    x, y, dx, dy = 4000.0, 4000.0, 3.0, 0.0
+    for i in range(steps):
+        if i % 60 == 0:
+            dx, dy = rng.choice(((3.0, 0.0), (-3.0, 0.0), (0.0, 3.0), (0.0, -3.0)))
+        x, y = min(max(x + dx, 0), 7980), min(max(y + dy, 0), 7988)
+        feet.append(pygame.Rect(round(x), round(y), 20, 12))
+
+    def polling():
+        entered = 0
+        inside = []
+        for rect in feet:
+            now = [t for t in index.query(rect, "trigger") if rect.colliderect(t.rect)]
+            entered += sum(t not in inside for t in now)
+            inside = now
+        return entered
+
+    def tracked():
+        entered = []
+        system = TriggerSystem()
+        system.on("coffre", enter=lambda trigger, entity: entered.append(trigger))
+        system.set_level(SimpleNamespace(index=index))
+        for rect in feet:
+            system.update(0, rect)
+        return len(entered)
+
+    assert polling() == tracked()
+    t_polling = timeit(polling)
+    t_tracked = timeit(tracked)
+    print(f"volumes: {triggers}, pas: {steps}, entrées: {tracked()}")
+    print(f"  test à chaque pas  : {t_polling / steps * 1e6:8.3f} µs / pas")
+    print(f"  changement de case : {t_tracked / steps * 1e6:8.3f} µs / pas")
+    print(f"  gain               : x{t_polling / t_tracked:.1f}")
+
+
+def bench_zoom(frames=120):
+    """Temps de dessin de la carte zoomée : redimensionnement par frame contre zoom pré-calculé"""
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from levels import LevelRegistry
+    from player import Player
+    from render import CameraGroup
+
+    pygame.init()
+    for size in ((800, 600), (1920, 1080)):
+        screen = pygame.display.set_mode(size)
+        for prescale in (False, True):
+            levels = LevelRegistry(size, zoom=1.5, use_compiled=False, prescale=prescale)
+            map_layer = levels.get_renderer("map.tmx")
+            group = CameraGroup(map_layer, default_layer=4, scale=getattr(map_layer.data, "scale", 1))
+            player = Player(0, 0)
+            group.add(player)
+
+            def draw():
+                # Caméra qui traverse la carte en diagonale : le tampon est redessiné en continu
+                for i in range(frames):
+                    player.position[0] = player.position[1] = i * 6
+                    player.update()
+                    group.center(player.rect)
+                    group.draw(screen)
+
+            best = timeit(draw, repeat=3)
+            label = "zoom pré-calculé" if prescale else "zoom par frame"
+            dims = f"{size[0]}x{size[1]}"
+            print(f"  {dims:<10}{label:<17}: {best / frames * 1000:8.3f} ms / frame")
+    pygame.quit()
+
+
+def bench_dialog(frames=600):
+    """Dialogue en machine à écrire : rendu du texte à chaque frame contre pages préparées"""
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from assets import AssetManager
+    from dialog import Dialog, DialogEngine, TEXT_COLOR, wrap
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    assets = AssetManager()
+    engine = DialogEngine(assets, screen.get_size())
+    paragraph = ("Là-bas, le temps est compté : trente secondes pour trouver le coffre au trésor, "
+                 "pas une de plus. Suis le chemin de terre et longe la rivière. ")
+    paragraphs = [("Paul", paragraph * 3)] * 20
+    start = time.perf_counter()
+    pages = engine.paginate(paragraphs)
+    prepare = time.perf_counter() - start
+    font, box, rect = engine.font, engine.box, engine.rect
+    px, py = engine.padding
+    lines = [wrap(font, text, rect.width - 2 * px) for _, text in paragraphs]
+
+    def rerender():
+        # Texte visible rendu à chaque frame, comme avec un simple font.render
+        shown = 0
+        for _ in range(frames):
+            shown += 1
+            screen.blit(box, rect)
+            screen.blit(font.render("Paul", True, TEXT_COLOR), (rect.x + px, rect.y + py))
+            remaining = shown
+            for row, line in enumerate(lines[0][:3], 1):
+                screen.blit(font.render(line[:remaining], True, TEXT_COLOR),
+                            (rect.x + px, rect.y + py + row * font.get_linesize()))
+                remaining -= len(line)
+                if remaining <= 0:
+                    break
+
+    def prepared():
+        dialog = Dialog(pages, rect, speed=60)
+        for _ in range(frames):
+            dialog.update(1 / 60)
+            dialog.draw(screen)
+
+    t_rerender = timeit(rerender, repeat=3)
+    t_prepared = timeit(prepared, repeat=3)
+    assets.shutdown()
+    print(f"paragraphes: {len(paragraphs)}, pages: {len(pages)}")
+    print(f"  préparation        : {prepare * 1000:8.2f} ms")
+    print(f"  rendu par frame    : {t_rerender / frames * 1000:8.3f} ms / frame")
+    print(f"  pages préparées    : {t_prepared / frames * 1000:8.3f} ms / frame")
+    pygame.quit()
+
+
+def bench_animation(count=500, steps=600):
+    """Animation de ``count`` personnages : minuteur par sprite contre clips avancés par lots"""
+    from animation import AnimationLibrary
+    from entities import EntityStore
+
+    library = AnimationLibrary()
+    sheets = ["Player.png", "ressources/assets/pnjs/paul.png", "ressources/assets/pnjs/robin.png",
+              "ressources/assets/pnjs/boss.png", "ressources/Characters.png", "ressources/Boats.png",
+              "ressources/Chest.png"]
+    start = time.perf_counter()
+    characters = [character for sheet in sheets for character in library.load(sheet).values()]
+    load = time.perf_counter() - start
+    rng = random.Random(4)
+    dt = 1 / 60
+
+    class Sprite:
+        # Comme l'ancien Player.animate : minuteur et image par direction, un sprite à la fois
+        def __init__(self, frames):
+            self.frames = frames
+            self.direction = rng.choice(list(frames))
+            self.moving = rng.random() < 0.7
+            self.frame = 0
+            self.timer = 0
+            self.image = frames[self.direction][0]
+
+        def animate(self, dt):
+            self.timer += 9 * dt
+            if self.moving:
+                if self.timer >= 1:
+                    self.frame = (self.frame + 1) % len(self.frames[self.direction])
+                    self.timer -= 1
+            else:
+                self.frame = 0
+            self.image = self.frames[self.direction][self.frame]
+
+    frames = {direction: characters[0].images(f"walk_{direction}") for direction in ("down", "left", "right", "up")}
+    sprites = [Sprite(frames) for _ in range(count)]
+
+    def per_sprite():
+        for _ in range(steps):
+            for sprite in sprites:
+                sprite.animate(dt)
+
+    store = EntityStore(capacity=count)
+    for _ in range(count):
+        i = store.spawn(0, 0, (32, 32), (16, 8), speed=60)
+        rng.choice(characters).attach(store, i)
+    store.direction[:count] = [rng.randrange(4) for _ in range(count)]
+    store.walking[:count] = [rng.random() < 0.7 for _ in range(count)]
+    images = library.atlas.images
+
+    def batched():
+        for _ in range(steps):
+            library.advance(store, dt)
+        # Images relues par les sprites, une fois par frame affichée
+        [images[i] for i in store.image[:count]]
+
+    t_sprite = timeit(per_sprite, repeat=3)
+    t_batched = timeit(batched, repeat=3)
+    width, height = library.atlas.surface.get_size()
+    print(f"feuilles: {len(sheets)}, personnages: {len(characters)}, clips: {len(library.clip_images)}, "
+          f"atlas {width}x{height} ({len(images)} images) en {load * 1000:.1f} ms")
+    print(f"personnages animés: {count}")
+    print(f"  minuteur par sprite: {t_sprite / steps * 1000:8.3f} ms / pas")
+    print(f"  clips par lots     : {t_batched / steps * 1000:8.3f} ms / pas")
+    print(f"  gain               : x{t_sprite / t_batched:.1f}")
+
+
+def bench_savegame(count=5000):
+    """Sauvegarde de ``count`` entités : JSON ligne par ligne contre colonnes binaires (savegame.py)"""
+    import json
+    import os
+    import tempfile
+    import numpy as np
+    import savegame
+    from entities import EntityStore
+
+    rng = random.Random(3)
+    store = EntityStore(capacity=count)
+    for _ in range(count):
+        store.spawn(rng.uniform(0, 8000), rng.uniform(0, 8000), (31, 32), (15, 8), speed=60, ai=True)
+    store.set_direction(store.active_ids(), np.array([rng.randrange(5) for _ in range(count)]))
+    store.step(1 / 60)
+    for i in range(0, count, 10):
+        store.despawn(i)
+    header = {"map": "map.tmx", "sim_time": 12.5, "level_time": 12.5, "countdown": None,
+              "npcs": [{"id": i, "name": f"pnj{i}", "path": []} for i in range(count)],
+              "free": list(store.free)}
+    names = [name for name, _ in EntityStore.COLUMNS]
+    directory = tempfile.mkdtemp()
+    json_path = os.path.join(directory, "partie.json")
+    sav_path = os.path.join(directory, "partie.sav")
+
+    def save_json():
+        # Une entrée par entité, champ par champ
+        entities = [{name: getattr(store, name)[i].item() for name in names} for i in range(store.count)]
+        with open(json_path, "w") as f:
+            json.dump(dict(header, entities=entities), f)
+
+    def load_json():
+        with open(json_path) as f:
+            data = json.load(f)
+        restored = EntityStore(capacity=1)
+        restored.restore({name: np.array([entity[name] for entity in data["entities"]], dtype=dtype)
+                          for name, dtype in EntityStore.COLUMNS}, data["free"])
+
+    def capture():
+        savegame.Snapshot(header, store.snapshot())
+
+    def save_binary():
+        savegame.write(sav_path, savegame.Snapshot(header, store.snapshot()))
+
+    def load_binary():
+        snapshot = savegame.read(sav_path)
+        EntityStore(capacity=1).restore(snapshot.columns, snapshot.header["free"])
+
+    t_save_json = timeit(save_json)
+    t_load_json = timeit(load_json)
+    t_capture = timeit(capture)
+    t_save = timeit(save_binary)
+    t_load = timeit(load_binary)
+    print(f"entités: {count}")
+    print(f"  JSON               : {os.path.getsize(json_path) / 1024:8.1f} Kio, écriture {t_save_json * 1000:7.2f} ms,"
+          f" lecture {t_load_json * 1000:7.2f} ms")
+    print(f"  binaire (.sav)     : {os.path.getsize(sav_path) / 1024:8.1f} Kio, écriture {t_save * 1000:7.2f} ms,"
+          f" lecture {t_load * 1000:7.2f} ms")
+    print(f"  copie (autosave)   : {t_capture * 1000:8.3f} ms dans la boucle de jeu")
+    for path in (json_path, sav_path):
+        os.remove(path)
+    os.rmdir(directory)
+
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from game import Game
+game = Game(headless=True, compiled_levels={compiled})
+game.draw()
+print(time.perf_counter() - start)
+"""
+
+
+def bench_startup(runs=5):
+    """Temps entre le lancement et la première frame jouable, tmx contre .lvl"""
+    import levelcache
+    levelcache.compile_all(".")
+
+    for compiled in (False, True):
+        # Un processus par mesure : aucun cache chaud d'une mesure à l'autre
+        times = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT.format(compiled=compiled)],
+                                    capture_output=True, text=True, check=True).stdout
+            times.append(float(output.strip().splitlines()[-1]))
+        label = "niveaux compilés" if compiled else "tmx"
+        print(f"  {label:<18} : {min(times) * 1000:8.1f} ms (meilleur de {runs})")
+
+
+BENCHMARKS = {
+    "animation": bench_animation,
+    "collisions": bench_collisions,
+    "dialog": bench_dialog,
+    "movement": bench_movement,
+    "entities": bench_entities,
+    "paths": bench_paths,
+    "savegame": bench_savegame,
+    "triggers": bench_triggers,
+    "startup": bench_startup,
+    "zoom": bench_zoom,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -0,0 +1,432 @@
+"""Chargement par morceaux (chunks) des cartes Tiled infinies.
+
+Au chargement, le fichier est lu une fois en flux (expat) : seule sa
+structure est gardée, les données de tuiles de chaque chunk (csv ou
+base64) restent dans le fichier, dont on ne retient que la position. Elles
+sont relues et décodées lorsque le renderer ou les collisions en ont
+besoin, et les chunks décodés sont gardés dans un cache LRU de taille
+fixe ; les images de tuiles ne sont découpées qu'à leur première
+utilisation. La mémoire ne dépend donc plus de la taille du monde que par
+quelques octets par chunk ; le démarrage reste une lecture du fichier
+entier, mais sans en construire l'arbre complet ni en garder le texte.
+"""
+import base64
+import gzip
+import os
+import zlib
+from array import array
+from collections import OrderedDict
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+import pygame
+import pyscroll
+
+from collisions import TileCollisionMap
+
+# Drapeaux de retournement stockés dans les bits de poids fort des gid
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+GID_MASK = 0x0FFFFFFF
+
+
+def is_infinite(filename):
+    """Renvoie True si le fichier tmx décrit une carte infinie"""
+    for _, element in ElementTree.iterparse(filename, events=("start",)):
+        return element.get("infinite") == "1"
+    return False
+
+
+def index_tmx(filename):
+    """Arbre XML d'un fichier tmx, sans le texte des chunks.
+
+    Chaque <chunk> reçoit à la place les attributs « start » et « end » :
+    positions (octets) du début de la balise et de la fin de son texte dans
+    le fichier, relues par ``read_chunk``.
+    """
+    builder = ElementTree.TreeBuilder()
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    in_chunk = False
+
+    def start(tag, attrs):
+        nonlocal in_chunk
+        if tag == "chunk":
+            attrs["start"] = str(parser.CurrentByteIndex)
+            in_chunk = True
+        builder.start(tag, attrs)
+
+    def end(tag):
+        nonlocal in_chunk
+        element = builder.end(tag)
+        if tag == "chunk":
+            element.set("end", str(parser.CurrentByteIndex))
+            in_chunk = False
+
+    def data(text):
+        if not in_chunk:
+            builder.data(text)
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    try:
+        with open(filename, "rb") as f:
+            parser.ParseFile(f)
+    finally:
+        # Les fonctions référencent le parser : cycle à casser pour libérer l'arbre tout de suite
+        parser.StartElementHandler = parser.EndElementHandler = parser.CharacterDataHandler = None
+    return builder.close()
+
+
+def read_chunk(filename, start, end):
+    """Relit le texte d'un chunk entre les positions notées par ``index_tmx``"""
+    if end <= start:
+        return ""  # <chunk/> vide
+    with open(filename, "rb") as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    return raw.partition(b">")[2].decode("ascii")
+
+
+def parse_properties(element):
+    """Lit les <properties> d'un élément tmx en dictionnaire"""
+    properties = {}
+    node = element.find("properties")
+    if node is None:
+        return properties
+    for prop in node.findall("property"):
+        value = prop.get("value", prop.text)
+        kind = prop.get("type", "string")
+        if kind == "int":
+            value = int(value)
+        elif kind == "float":
+            value = float(value)
+        elif kind == "bool":
+            value = value == "true"
+        properties[prop.get("name")] = value
+    return properties
+
+
+class MapObject:
+    """Objet d'un calque d'objets, avec les mêmes attributs que ceux de pytmx"""
+
+    def __init__(self, element, shift_x, shift_y):
+        self.id = int(element.get("id", 0))
+        self.name = element.get("name")
+        self.type = element.get("type") or element.get("class")
+        self.x = float(element.get("x", 0)) + shift_x
+        self.y = float(element.get("y", 0)) + shift_y
+        self.width = float(element.get("width", 0))
+        self.height = float(element.get("height", 0))
+        self.properties = parse_properties(element)
+
+
+class Tileset:
+    """Jeu de tuiles dont l'image n'est chargée et découpée qu'à la demande"""
+
+    def __init__(self, element, directory):
+        self.firstgid = int(element.get("firstgid"))
+        source = element.get("source")
+        if source is not None:
+            path = os.path.join(directory, source)
+            element = ElementTree.parse(path).getroot()
+            directory = os.path.dirname(path)
+
+        self.tilewidth = int(element.get("tilewidth"))
+        self.tileheight = int(element.get("tileheight"))
+        self.tilecount = int(element.get("tilecount", 0))
+        self.columns = int(element.get("columns", 0))
+        self.spacing = int(element.get("spacing", 0))
+        self.margin = int(element.get("margin", 0))
+
+        image = element.find("image")
+        self.image_path = os.path.join(directory, image.get("source"))
+        trans = image.get("trans")
+        self.colorkey = pygame.Color("#" + trans) if trans else None
+        self._image = None
+
+    def get_image(self):
+        if self._image is None:
+            image = pygame.image.load(self.image_path)
+            if pygame.display.get_surface() is not None:
+                if self.colorkey is not None:
+                    image.set_colorkey(self.colorkey)
+                    image = image.convert()
+                else:
+                    image = image.convert_alpha()
+            self._image = image
+        return self._image
+
+    def get_tile(self, local_id):
+        """Découpe la tuile ``local_id`` dans l'image du jeu de tuiles"""
+        x = self.margin + (local_id % self.columns) * (self.tilewidth + self.spacing)
+        y = self.margin + (local_id // self.columns) * (self.tileheight + self.spacing)
+        rect = pygame.Rect(x, y, self.tilewidth, self.tileheight)
+        return self.get_image().subsurface(rect).copy()
+
+
+class TileLayer:
+    """Calque de tuiles : position des chunks encodés dans le fichier, par coordonnées de chunk"""
+
+    def __init__(self, element, filename):
+        self.filename = filename
+        self.name = element.get("name")
+        self.visible = element.get("visible", "1") != "0"
+        self.chunks = {}
+
+        data = element.find("data")
+        self.encoding = data.get("encoding")
+        self.compression = data.get("compression")
+        for chunk in data.findall("chunk"):
+            x, y = int(chunk.get("x")), int(chunk.get("y"))
+            self.chunks[(x, y)] = (int(chunk.get("width")), int(chunk.get("height")),
+                                   int(chunk.get("start")), int(chunk.get("end")))
+
+    def read(self, source):
+        """Gid d'un chunk (entrée de ``chunks``), relu dans le fichier et décodé"""
+        width, height, start, end = source
+        return self.decode(read_chunk(self.filename, start, end), width * height)
+
+    def decode(self, text, count):
+        """Décode les gid d'un chunk"""
+        if self.encoding == "csv":
+            gids = array("I", (int(value) for value in text.split(",") if value.strip()))
+        elif self.encoding == "base64":
+            raw = base64.b64decode(text.strip())
+            if self.compression == "zlib":
+                raw = zlib.decompress(raw)
+            elif self.compression == "gzip":
+                raw = gzip.decompress(raw)
+            elif self.compression:
+                raise ValueError(f"compression non supportée : {self.compression}")
+            gids = array("I")
+            gids.frombytes(raw)
+        else:
+            raise ValueError(f"encodage non supporté : {self.encoding}")
+        if len(gids) != count:
+            raise ValueError("taille de chunk incohérente")
+        return gids
+
+
+class ChunkedMap:
+    """Structure d'une carte infinie ; les données de tuiles sont lues chunk par chunk.
+
+    Les coordonnées sont décalées pour que le coin haut-gauche du chunk le
+    plus éloigné soit en (0, 0), comme attendu par pyscroll.
+    """
+
+    def __init__(self, filename, max_chunks=256):
+        self.filename = filename
+        root = index_tmx(filename)
+        directory = os.path.dirname(filename)
+
+        self.tilewidth = int(root.get("tilewidth"))
+        self.tileheight = int(root.get("tileheight"))
+        self.properties = parse_properties(root)
+        self.tilesets = sorted((Tileset(node, directory) for node in root.findall("tileset")),
+                               key=lambda tileset: tileset.firstgid)
+
+        # Les indices de calque suivent l'ordre du fichier, objets compris,
+        # comme pytmx (default_layer du PyscrollGroup garde le même sens)
+        self.layers = []
+        self.tile_layers = {}
+        object_groups = []
+        for node in root:
+            if node.tag == "layer":
+                layer = TileLayer(node, filename)
+                self.tile_layers[len(self.layers)] = layer
+                self.layers.append(layer)
+            elif node.tag == "objectgroup":
+                object_groups.append(node)
+                self.layers.append(None)
+
+        # Taille des chunks et étendue du monde
+        sizes = {(w, h) for layer in self.tile_layers.values() for w, h, _, _ in layer.chunks.values()}
+        self.chunk_width, self.chunk_height = sizes.pop() if sizes else (16, 16)
+        if sizes:
+            raise ValueError("chunks de tailles différentes")
+        coords = [pos for layer in self.tile_layers.values() for pos in layer.chunks] or [(0, 0)]
+        self.origin_x = min(x for x, _ in coords)
+        self.origin_y = min(y for _, y in coords)
+        self.width = max(x for x, _ in coords) + self.chunk_width - self.origin_x
+        self.height = max(y for _, y in coords) + self.chunk_height - self.origin_y
+
+        shift_x = -self.origin_x * self.tilewidth
+        shift_y = -self.origin_y * self.tileheight
+        self.objects = [MapObject(obj, shift_x, shift_y)
+                        for group in object_groups for obj in group.findall("object")]
+
+        self.max_chunks = max_chunks
+        self._decoded = OrderedDict()
+        self._tiles = {}
+
+    def layer_index(self, name):
+        for index, layer in self.tile_layers.items():
+            if layer.name == name:
+                return index
+        raise ValueError(f"calque introuvable : {name}")
+
+    @property
+    def visible_tile_layers(self):
+        return [index for index, layer in self.tile_layers.items() if layer.visible]
+
+    def get_chunk(self, layer_index, cx, cy):
+        """Renvoie les gid du chunk (cx, cy) (coordonnées décalées), ou None s'il est vide"""
+        key = (layer_index, cx, cy)
+        decoded = self._decoded
+        if key in decoded:
+            decoded.move_to_end(key)
+            return decoded[key]
+
+        layer = self.tile_layers[layer_index]
+        source = layer.chunks.get((cx * self.chunk_width + self.origin_x,
+                                   cy * self.chunk_height + self.origin_y))
+        gids = layer.read(source) if source is not None else None
+
+        decoded[key] = gids
+        if len(decoded) > self.max_chunks:
+            decoded.popitem(last=False)
+        return gids
+
+    def get_gid(self, layer_index, x, y):
+        """Renvoie le gid (drapeaux compris) de la tuile (x, y)"""
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return 0
+        cw, ch = self.chunk_width, self.chunk_height
+        gids = self.get_chunk(layer_index, x // cw, y // ch)
+        if gids is None:
+            return 0
+        return gids[(y % ch) * cw + x % cw]
+
+    def get_tile_image(self, gid):
+        """Renvoie l'image d'un gid, découpée et retournée à la première demande"""
+        image = self._tiles.get(gid)
+        if image is not None or gid in self._tiles:
+            return image
+
+        tile_id = gid & GID_MASK
+        image = None
+        for tileset in reversed(self.tilesets):
+            if tile_id >= tileset.firstgid:
+                image = tileset.get_tile(tile_id - tileset.firstgid)
+                break
+        if image is not None and gid & (FLIPPED_HORIZONTALLY | FLIPPED_VERTICALLY | FLIPPED_DIAGONALLY):
+            if gid & FLIPPED_DIAGONALLY:
+                image = pygame.transform.flip(pygame.transform.rotate(image, 270), True, False)
+            image = pygame.transform.flip(image, bool(gid & FLIPPED_HORIZONTALLY),
+                                          bool(gid & FLIPPED_VERTICALLY))
+        self._tiles[gid] = image
+        return image
+
+    def decoded_chunks(self):
+        return len(self._decoded)
+
+
+class ChunkedMapData(pyscroll.data.PyscrollDataAdapter):
+    """Source de données pyscroll qui lit les tuiles chunk par chunk"""
+
+    def __init__(self, chunked_map):
+        super().__init__()
+        self.map = chunked_map
+        self.reload_animations()
+
+    @property
+    def tile_size(self):
+        return self.map.tilewidth, self.map.tileheight
+
+    @property
+    def map_size(self):
+        return self.map.width, self.map.height
+
+    @property
+    def visible_tile_layers(self):
+        return self.map.visible_tile_layers
+
+    def reload_data(self):
+        self.map = ChunkedMap(self.map.filename, self.map.max_chunks)
+
+    def get_animations(self):
+        return ()
+
+    def convert_surfaces(self, parent, alpha=False):
+        pass
+
+    def _get_tile_image(self, x, y, l):
+        gid = self.map.get_gid(l, x, y)
+        return self.map.get_tile_image(gid) if gid else None
+
+    def get_tile_images_by_rect(self, rect):
+        # Parcours chunk par chunk : une seule recherche dans le cache par chunk
+        x1, y1, x2, y2 = pyscroll.common.rect_to_bb(rect)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, self.map.width - 1), min(y2, self.map.height - 1)
+        cw, ch = self.map.chunk_width, self.map.chunk_height
+        get_image = self.map.get_tile_image
+
+        for l in self.visible_tile_layers:
+            for cy in range(y1 // ch, y2 // ch + 1):
+                for cx in range(x1 // cw, x2 // cw + 1):
+                    gids = self.map.get_chunk(l, cx, cy)
+                    if gids is None:
+                        continue
+                    for y in range(max(y1, cy * ch), min(y2, cy * ch + ch - 1) + 1):
+                        row = (y - cy * ch) * cw
+                        for x in range(max(x1, cx * cw), min(x2, cx * cw + cw - 1) + 1):
+                            gid = gids[row + x - cx * cw]
+                            if gid:
+                                tile = get_image(gid)
+                                if tile:
+                                    yield x, y, l, tile
+
+
+class ChunkedCollisionMap(TileCollisionMap):
+    """Collisions par tuile lues dans les chunks du calque ``walls``.
+
+    Les chunks restent en lecture seule : les tuiles modifiées pendant la
+    partie sont gardées à part et l'emportent sur le calque.
+    """
+
+    def __init__(self, chunked_map, layer_name="walls"):
+        self.map = chunked_map
+        self.layer = chunked_map.layer_index(layer_name)
+        self.width = chunked_map.width
+        self.height = chunked_map.height
+        self.tile_width = chunked_map.tilewidth
+        self.tile_height = chunked_map.tileheight
+        self.overrides = {}
+
+    def is_wall(self, tx, ty):
+        if tx < 0 or ty < 0 or tx >= self.width or ty >= self.height:
+            return True
+        wall = self.overrides.get((tx, ty))
+        if wall is not None:
+            return wall
+        return self.map.get_gid(self.layer, tx, ty) != 0
+
+    def set_wall(self, tx, ty, value=True):
+        """Modifie une tuile pendant la partie"""
+        self.overrides[(tx, ty)] = bool(value)
+
+    def wall_tiles(self):
+        """Coordonnées (tx, ty) de toutes les tuiles murs, chunk par chunk.
+
+        Seuls les chunks présents dans le fichier sont lus, une fois chacun
+        et sans passer par le cache LRU : le parcours ne chasse pas les
+        chunks du renderer et peut se faire dans un autre thread.
+        """
+        chunked = self.map
+        layer = chunked.tile_layers[self.layer]
+        overrides = self.overrides
+        for (x, y), source in layer.chunks.items():
+            ox, oy = x - chunked.origin_x, y - chunked.origin_y
+            width = source[0]
+            for i, gid in enumerate(layer.read(source)):
+                if gid:
+                    tile = (ox + i % width, oy + i // width)
+                    if tile not in overrides:  # Tuiles modifiées : données par la boucle suivante
+                        yield tile
+        for tile, wall in overrides.items():
+            if wall:
+                yield tile
@@ -0,0 +1,222 @@
+import math
+
+import pygame
+
+
+class SpatialHash:
+    """Index spatial des rectangles de collision sur une grille uniforme.
+
+    Chaque rectangle est rangé dans toutes les cases qu'il recouvre ; une
+    requête ne teste donc que les rectangles proches au lieu de parcourir
+    toute la liste des murs. Les entrées sont classées par genre ("wall",
+    "portal", "goal"...) : murs et déclencheurs partagent le même index.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.count = 0
+
+    @classmethod
+    def from_rects(cls, rects, cell_size=64, kind="wall"):
+        index = cls(cell_size)
+        for rect in rects:
+            index.add(rect, kind)
+        return index
+
+    def _cells(self, rect, kind):
+        """Renvoie les clés des cases recouvertes par le rectangle"""
+        size = self.cell_size
+        x0 = rect.left // size
+        y0 = rect.top // size
+        x1 = (rect.right - 1) // size
+        y1 = (rect.bottom - 1) // size
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield kind, cx, cy
+
+    def add(self, rect, kind="wall", item=None):
+        """Ajoute une entrée à l'index (par défaut, le rectangle lui-même)"""
+        if item is None:
+            item = rect
+        for cell in self._cells(rect, kind):
+            self.cells.setdefault(cell, []).append(item)
+        self.count += 1
+
+    def remove(self, rect, kind="wall", item=None):
+        """Retire une entrée de l'index (l'objet ajouté lui-même) ; renvoie False s'il n'y est pas"""
+        if item is None:
+            item = rect
+        found = False
+        for cell in self._cells(rect, kind):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                continue
+            for i, other in enumerate(bucket):
+                if other is item:
+                    del bucket[i]
+                    found = True
+                    break
+            if not bucket:
+                del self.cells[cell]
+        if found:
+            self.count -= 1
+        return found
+
+    def query(self, rect, kind="wall"):
+        """Renvoie les entrées rangées dans les cases proches de ``rect``"""
+        found = []
+        seen = set()
+        cells = self.cells
+        for cell in self._cells(rect, kind):
+            bucket = cells.get(cell)
+            if not bucket:
+                continue
+            for other in bucket:
+                if id(other) not in seen:
+                    seen.add(id(other))
+                    found.append(other)
+        return found
+
+    def collide(self, rect, kind="wall"):
+        """Renvoie True si ``rect`` touche un des rectangles de l'index"""
+        cells = self.cells
+        for cell in self._cells(rect, kind):
+            bucket = cells.get(cell)
+            if bucket and rect.collidelist(bucket) > -1:
+                return True
+        return False
+
+    def __len__(self):
+        return self.count
+
+
+class TileCollisionMap:
+    """Carte de collision compacte construite à partir d'un calque de tuiles.
+
+    Une case par tuile (0 = libre, 1 = mur) stockée dans un bytearray ;
+    tester un rectangle ne coûte qu'une lecture par tuile touchée.
+    """
+
+    def __init__(self, width, height, tile_width=16, tile_height=16):
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.cells = bytearray(width * height)
+
+    @classmethod
+    def from_layer(cls, tmx_data, layer_name="walls"):
+        """Construit la carte à partir du calque ``layer_name`` d'un tmx"""
+        layer = tmx_data.get_layer_by_name(layer_name)
+        bitmap = cls(tmx_data.width, tmx_data.height, tmx_data.tilewidth, tmx_data.tileheight)
+        cells = bitmap.cells
+        width = bitmap.width
+        for y, row in enumerate(layer.data):
+            for x, gid in enumerate(row):
+                if gid:
+                    cells[y * width + x] = 1
+        return bitmap
+
+    def is_wall(self, tx, ty):
+        """Renvoie True si la tuile (tx, ty) est un mur (hors carte = mur)"""
+        if tx < 0 or ty < 0 or tx >= self.width or ty >= self.height:
+            return True
+        return self.cells[ty * self.width + tx] == 1
+
+    def set_wall(self, tx, ty, value=True):
+        """Modifie une tuile pendant la partie"""
+        self.cells[ty * self.width + tx] = 1 if value else 0
+
+    def wall_tiles(self):
+        """Coordonnées (tx, ty) de toutes les tuiles murs"""
+        width = self.width
+        for i, wall in enumerate(self.cells):
+            if wall:
+                yield i % width, i // width
+
+    def query(self, rect):
+        """Renvoie les rectangles des tuiles murs touchées par ``rect``"""
+        tw, th = self.tile_width, self.tile_height
+        return [pygame.Rect(tx * tw, ty * th, tw, th)
+                for ty in range(rect.top // th, (rect.bottom - 1) // th + 1)
+                for tx in range(rect.left // tw, (rect.right - 1) // tw + 1)
+                if self.is_wall(tx, ty)]
+
+    def collide(self, rect):
+        """Renvoie True si ``rect`` touche une tuile mur"""
+        x0 = rect.left // self.tile_width
+        y0 = rect.top // self.tile_height
+        x1 = (rect.right - 1) // self.tile_width
+        y1 = (rect.bottom - 1) // self.tile_height
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                if self.is_wall(tx, ty):
+                    return True
+        return False
+
+
+def sweep(box, dx, dy, colliders):
+    """Déplace la boîte ``box`` (x, y, largeur, hauteur) de (dx, dy) contre les murs.
+
+    Le déplacement se fait axe par axe, x puis y. Les murs de toute la zone
+    balayée sont cherchés dans ``colliders`` (SpatialHash ou TileCollisionMap)
+    et, sur chaque axe, la boîte s'arrête exactement au contact du premier :
+    aucun mur n'est traversé, quelle que soit la longueur du déplacement, et
+    l'autre axe reste libre, la boîte glisse le long des murs. Les murs que
+    la boîte chevauche déjà sont ignorés. Renvoie la nouvelle position et
+    True si un mur a raccourci le déplacement : (x, y, bloqué). Arriver
+    pile au contact d'un mur n'est pas être bloqué.
+    """
+    x, y, w, h = box
+    if not dx and not dy:
+        return x, y, False
+    left, top = math.floor(min(x, x + dx)), math.floor(min(y, y + dy))
+    right, bottom = math.ceil(max(x, x + dx) + w), math.ceil(max(y, y + dy) + h)
+    area = pygame.Rect(left, top, right - left, bottom - top)
+    walls = colliders.query(area)
+    if walls:
+        # Tri en C des murs qui touchent vraiment la zone balayée
+        walls = [walls[i] for i in area.collidelistall(walls)]
+    if not walls:
+        return x + dx, y + dy, False
+
+    blocked = False
+    if dx:
+        target = x + dx
+        for wall in walls:
+            if wall.bottom <= y or wall.top >= y + h:
+                continue  # Pas en face de la boîte
+            if dx > 0 and wall.left >= x + w and wall.left - w < target:
+                target, blocked = wall.left - w, True
+            elif dx < 0 and wall.right <= x and wall.right > target:
+                target, blocked = wall.right, True
+        x = target
+    if dy:
+        target = y + dy
+        for wall in walls:
+            if wall.right <= x or wall.left >= x + w:
+                continue
+            if dy > 0 and wall.top >= y + h and wall.top - h < target:
+                target, blocked = wall.top - h, True
+            elif dy < 0 and wall.bottom <= y and wall.bottom > target:
+                target, blocked = wall.bottom, True
+        y = target
+    return x, y, blocked
+
+
+def slide(entity, old, offset, colliders):
+    """Refait le déplacement du pas d'une entité en glissant contre les murs.
+
+    ``entity`` a sa position dans un EntityStore (``store``, ``id``) et des
+    pieds ``feet`` décalés de ``offset`` par rapport à son image ; ``old``
+    est sa position au début du pas. Renvoie True si elle a été bloquée.
+    """
+    store, i = entity.store, entity.id
+    ox, oy = offset
+    old_x, old_y = old
+    dx, dy = store.x[i] - old_x, store.y[i] - old_y
+    x, y, blocked = sweep((old_x + ox, old_y + oy, entity.feet.width, entity.feet.height), dx, dy, colliders)
+    store.x[i], store.y[i] = x - ox, y - oy
+    entity.update()
+    return blocked
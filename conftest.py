@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Pas de fenêtre ni de son pendant les tests
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+@pytest.fixture(autouse=True)
+def in_root(monkeypatch):
+    """Le jeu lit ses cartes et ressources par des chemins relatifs au dossier du projet"""
+    monkeypatch.chdir(ROOT)
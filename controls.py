@@ -0,0 +1,108 @@
+"""Commandes du jeu : touches associées à des actions.
+
+Le jeu ne lit plus le clavier touche par touche : chaque touche est liée
+à une action (« up », « interact », « pause »...). Les touches tenues sont
+suivies à partir des événements KEYDOWN/KEYUP, sans interroger le clavier
+à chaque frame, et un appui sur une touche produit l'action
+correspondante. Les associations par défaut peuvent être remplacées dans
+settings.ini (``key_interact=e,space``).
+
+Tout objet indexable par nom d'action (Controls, replay.KeyState,
+headless.ScriptedKeys) peut servir d'état des commandes pour un pas de
+simulation.
+"""
+import math
+
+import pygame
+
+MOVES = ("up", "down", "left", "right")
+
+DEFAULT_BINDINGS = {
+    "up": (pygame.K_UP, pygame.K_z, pygame.K_w),
+    "down": (pygame.K_DOWN, pygame.K_s),
+    "left": (pygame.K_LEFT, pygame.K_q, pygame.K_a),
+    "right": (pygame.K_RIGHT, pygame.K_d),
+    "interact": (pygame.K_e, pygame.K_SPACE, pygame.K_RETURN),
+    "pause": (pygame.K_ESCAPE,),
+    "overlay": (pygame.K_F3,),
+}
+
+DIAGONAL = 1 / math.sqrt(2)
+
+
+def direction(state):
+    """Vecteur de déplacement (dx, dy) demandé par un état des commandes.
+
+    Les directions opposées s'annulent ; en diagonale le vecteur est
+    normalisé, pour ne pas aller plus vite qu'en ligne droite.
+    """
+    dx = state["right"] - state["left"]
+    dy = state["down"] - state["up"]
+    if dx and dy:
+        return dx * DIAGONAL, dy * DIAGONAL
+    return float(dx), float(dy)
+
+
+class Controls:
+    """Associations touches -> actions et actions tenues, mises à jour par les événements"""
+
+    def __init__(self, bindings=None):
+        self.bindings = dict(DEFAULT_BINDINGS)
+        if bindings:
+            self.bindings.update(bindings)
+        self.held = set()  # Touches enfoncées
+        self._actions = {}
+        self.rebuild()
+
+    def rebuild(self):
+        """Recalcule la table touche -> action après un changement d'associations"""
+        self._actions = {}
+        for action, keys in self.bindings.items():
+            for key in keys:
+                self._actions[key] = action
+
+    def bind(self, action, keys):
+        self.bindings[action] = tuple(keys)
+        self.rebuild()
+
+    def action_for(self, key):
+        return self._actions.get(key)
+
+    def handle_event(self, event):
+        """Suit les touches tenues ; renvoie l'action d'une touche qui vient d'être enfoncée"""
+        if event.type == pygame.KEYDOWN:
+            self.held.add(event.key)
+            return self._actions.get(event.key)
+        if event.type == pygame.KEYUP:
+            self.held.discard(event.key)
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            self.reset()  # Les KEYUP n'arriveront pas à la fenêtre
+        return None
+
+    def reset(self):
+        """Oublie les touches tenues (après un menu ou une perte de focus)"""
+        self.held.clear()
+
+    def __getitem__(self, action):
+        """Vrai si une des touches de l'action est tenue"""
+        return any(key in self.held for key in self.bindings.get(action, ()))
+
+    def load(self, name, value):
+        """Lit une ligne ``key_<action>=<touches>`` de settings.ini ; renvoie False si ce n'en est pas une"""
+        if not name.startswith("key_"):
+            return False
+        keys = []
+        for key_name in value.split(","):
+            try:
+                keys.append(pygame.key.key_code(key_name.strip()))
+            except ValueError:
+                print(f"Touche inconnue pour {name}: {key_name}")
+        if keys:
+            self.bind(name[4:], keys)
+        return True
+
+    def save(self, f):
+        """Écrit les associations qui diffèrent de celles par défaut"""
+        for action, keys in self.bindings.items():
+            if tuple(keys) != DEFAULT_BINDINGS.get(action):
+                f.write(f"key_{action}={','.join(pygame.key.name(key) for key in keys)}\n")
@@ -0,0 +1,277 @@
+"""Dialogues : boîte de ressources/assets/dialogs, texte paginé une seule fois.
+
+Les répliques d'une carte sont dans ressources/assets/dialogs/<carte>.txt,
+lu en arrière-plan au chargement de la carte et analysé à la première
+conversation. Une conversation est découpée en lignes et en pages une
+seule fois puis gardée en cache ; chaque ligne est rendue une fois avec
+dialog_font.ttf, avec la position de chacun de ses caractères. L'effet
+machine à écrire ne fait ensuite que copier sur la page les morceaux de
+ligne nouvellement révélés, et l'affichage d'une page coûte un seul blit,
+quelle que soit la longueur du dialogue.
+
+Format des fichiers de dialogues :
+
+    # commentaire
+    [paul]
+    @Paul
+    Salut ! Chaque paragraphe commence une nouvelle page.
+    Une ligne « @nom » change d'interlocuteur.
+"""
+import os
+
+import pygame
+
+DIRECTORY = "ressources/assets/dialogs"
+BOX = os.path.join(DIRECTORY, "dialog_box.png")
+FONT = os.path.join(DIRECTORY, "dialog_font.ttf")
+
+TEXT_COLOR = (50, 50, 70)
+SPEAKER_COLOR = (61, 100, 151)
+
+
+def script_path(level_filename):
+    return os.path.join(DIRECTORY, os.path.splitext(os.path.basename(level_filename))[0] + ".txt")
+
+
+def parse_script(text):
+    """Renvoie {conversation: [(interlocuteur, paragraphe), ...]}"""
+    script = {}
+    current = None
+    speaker = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            current = script.setdefault(line[1:-1].strip(), [])
+            speaker = None
+        elif line.startswith("@"):
+            speaker = line[1:].strip() or None
+        elif current is not None:
+            current.append((speaker, line))
+    return script
+
+
+def read_script(path):
+    """Lit un fichier de dialogues (vide s'il n'existe pas)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return parse_script(f.read())
+    except FileNotFoundError:
+        return {}
+
+
+def nine_slice(image, size, border):
+    """Agrandit ``image`` à ``size`` sans déformer ses coins (``border`` pixels)"""
+    w, h = image.get_size()
+    b = border
+    result = pygame.Surface(size, pygame.SRCALPHA)
+    columns = ((0, b, 0, b), (b, w - 2 * b, b, size[0] - 2 * b), (w - b, b, size[0] - b, b))
+    rows = ((0, b, 0, b), (b, h - 2 * b, b, size[1] - 2 * b), (h - b, b, size[1] - b, b))
+    for sx, sw, dx, dw in columns:
+        for sy, sh, dy, dh in rows:
+            piece = image.subsurface((sx, sy, sw, sh))
+            if (sw, sh) != (dw, dh):
+                piece = pygame.transform.scale(piece, (dw, dh))
+            result.blit(piece, (dx, dy))
+    return result
+
+
+def wrap(font, text, width):
+    """Découpe ``text`` en lignes d'au plus ``width`` pixels (mots trop longs coupés)"""
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if font.size(candidate)[0] <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        # Mot plus long qu'une ligne : coupé où il le faut
+        while font.size(word)[0] > width:
+            cut = max(1, next(i for i in range(1, len(word) + 1) if font.size(word[:i])[0] > width) - 1)
+            lines.append(word[:cut])
+            word = word[cut:]
+        line = word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def char_offsets(font, line):
+    """Abscisse de fin de chaque caractère de ``line`` (avances cumulées des glyphes)"""
+    metrics = font.metrics(line)
+    if None in metrics:
+        # Glyphe absent de la police : mesure des préfixes, plus lente
+        return [font.size(line[:i])[0] for i in range(1, len(line) + 1)]
+    offsets = []
+    x = 0
+    for glyph in metrics:
+        x += glyph[4]
+        offsets.append(x)
+    return offsets
+
+
+class Page:
+    """Page de dialogue : fond (boîte et interlocuteur) et lignes rendues une fois"""
+
+    def __init__(self, background, runs, offsets, positions):
+        self.background = background
+        self.runs = runs            # Surface de chaque ligne
+        self.offsets = offsets      # Abscisse de fin de chaque caractère, par ligne
+        self.positions = positions  # Position de chaque ligne dans la boîte
+        self.length = sum(len(line) for line in offsets)
+        self._full = None
+
+    def full(self):
+        """Page entièrement écrite, rendue à la première demande"""
+        if self._full is None:
+            self._full = self.background.copy()
+            self._full.blits(list(zip(self.runs, self.positions)), doreturn=False)
+        return self._full
+
+    def reveal(self, canvas, start, end):
+        """Copie sur ``canvas`` les caractères ``start`` à ``end`` de la page"""
+        for run, offsets, (x, y) in zip(self.runs, self.offsets, self.positions):
+            count = len(offsets)
+            if start < count and end > 0:
+                left = offsets[start - 1] if start > 0 else 0
+                right = offsets[min(end, count) - 1]
+                canvas.blit(run, (x + left, y), (left, 0, right - left, run.get_height()))
+            start = max(0, start - count)
+            end -= count
+            if end <= 0:
+                break
+
+
+class Dialog:
+    """Conversation affichée : pages successives écrites en machine à écrire"""
+
+    def __init__(self, pages, rect, speed=45):
+        self.pages = pages
+        self.rect = rect
+        self.speed = speed  # Caractères par seconde
+        self.index = 0
+        self._open_page()
+
+    def _open_page(self):
+        page = self.pages[self.index]
+        self.canvas = page.background.copy()
+        self.shown = 0
+        self.progress = 0.0
+
+    @property
+    def page(self):
+        return self.pages[self.index]
+
+    @property
+    def complete(self):
+        return self.shown >= self.page.length
+
+    def update(self, dt):
+        """Fait avancer l'écriture de la page"""
+        if self.complete:
+            return
+        self.progress += self.speed * dt
+        count = min(int(self.progress), self.page.length)
+        if count > self.shown:
+            self.page.reveal(self.canvas, self.shown, count)
+            self.shown = count
+
+    def advance(self):
+        """Termine la page en cours, sinon passe à la suivante ; renvoie False à la fin du dialogue"""
+        if not self.complete:
+            self.canvas = self.page.full()
+            self.shown = self.page.length
+            return True
+        if self.index + 1 < len(self.pages):
+            self.index += 1
+            self._open_page()
+            return True
+        return False
+
+    def draw(self, surface):
+        surface.blit(self.canvas, self.rect)
+
+
+class DialogEngine:
+    """Scripts de dialogues par carte et conversations paginées, en cache"""
+
+    def __init__(self, assets, screen_size, font_size=20, lines=3, margin=20):
+        self.assets = assets
+        width, height = screen_size
+        self.font_size = font_size
+        self.padding = (48, 18)  # Intérieur de la boîte agrandie
+        # Hauteur : interlocuteur et ``lines`` lignes de texte (interligne de la police ~ taille + 6)
+        self.rect = pygame.Rect(0, 0, width - 2 * margin, (lines + 1) * (font_size + 6) + 2 * self.padding[1])
+        self.rect.midbottom = (width // 2, height - margin)
+        self.font = None
+        self.box = None
+        self._scripts = {}        # carte -> Future du script
+        self._conversations = {}  # (carte, conversation, interlocuteur) -> pages
+
+    def load(self, level_filename):
+        """Lance la lecture du script de la carte en arrière-plan (une fois)"""
+        path = script_path(level_filename)
+        self._scripts[level_filename] = self.assets.submit(("dialogs", path), read_script, path)
+
+    def script(self, level_filename):
+        future = self._scripts.get(level_filename)
+        if future is None:
+            self.load(level_filename)
+            future = self._scripts[level_filename]
+        return future.result()
+
+    def _prepare(self):
+        # Police et boîte chargées au premier dialogue
+        if self.font is None:
+            self.font = pygame.font.Font(FONT, self.font_size)
+            image = self.assets.image(BOX, alpha=True).copy()
+            # L'image porte un texte d'exemple à peine visible : intérieur repeint en uni
+            w, h = image.get_size()
+            image.fill(image.get_at((w - 30, h // 2)), (22, 7, w - 44, h - 14))
+            image = pygame.transform.scale(image, (w * 2, h * 2))
+            self.box = nine_slice(image, self.rect.size, 44)
+            if pygame.display.get_surface() is not None:
+                self.box = self.box.convert_alpha()
+
+    def paginate(self, paragraphs):
+        """Découpe [(interlocuteur, paragraphe), ...] en pages prêtes à l'affichage"""
+        self._prepare()
+        font = self.font
+        px, py = self.padding
+        width = self.rect.width - 2 * px
+        line_height = font.get_linesize()
+        per_page = (self.rect.height - 2 * py) // line_height - 1  # Une ligne pour l'interlocuteur
+
+        pages = []
+        backgrounds = {}  # Un fond par interlocuteur, partagé par ses pages
+        for speaker, text in paragraphs:
+            background = backgrounds.get(speaker)
+            if background is None:
+                background = backgrounds[speaker] = self.box.copy()
+                if speaker:
+                    background.blit(font.render(speaker, True, SPEAKER_COLOR), (px, py))
+            lines = wrap(font, text, width)
+            for first in range(0, len(lines), per_page):
+                runs, offsets, positions = [], [], []
+                for row, line in enumerate(lines[first:first + per_page], 1):
+                    runs.append(font.render(line, True, TEXT_COLOR))
+                    offsets.append(char_offsets(font, line))
+                    positions.append((px, py + row * line_height))
+                pages.append(Page(background, runs, offsets, positions))
+        return pages
+
+    def open(self, level_filename, key, speaker=None):
+        """Conversation ``key`` de la carte ; une clé absente du script est affichée telle quelle"""
+        cache_key = (level_filename, key, speaker)
+        pages = self._conversations.get(cache_key)
+        if pages is None:
+            script = self.script(level_filename) if level_filename else {}
+            pages = self._conversations[cache_key] = self.paginate(script.get(key) or [(speaker, key)])
+        return Dialog(pages, self.rect)
+
+    def text(self, text, speaker=None):
+        """Message ponctuel (coffre...), paginé une fois par texte"""
+        return self.open(None, text, speaker)
@@ -0,0 +1,305 @@
+"""Entités (joueur, pnj) stockées en tableaux NumPy.
+
+L'état de toutes les entités est rangé colonne par colonne (position,
+vitesse, direction, animation, pieds...) : déplacement, animation (voir
+animation.py) et phase large des collisions sont calculés pour toutes les
+entités en une seule opération vectorisée par pas de simulation. Les
+sprites pygame ne sont plus que des vues sur une ligne du stockage.
+"""
+import numpy as np
+import pygame
+
+from animation import library
+from collisions import slide
+
+DOWN, LEFT, RIGHT, UP = range(4)
+
+
+class EntityStore:
+    """Stockage « structure de tableaux » de l'état des entités"""
+
+    # Une colonne par attribut, une ligne par entité
+    COLUMNS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("old_x", np.float64),
+        ("old_y", np.float64),
+        ("vx", np.float64),
+        ("vy", np.float64),
+        ("speed", np.float64),
+        ("direction", np.int8),
+        ("character", np.int16),  # Personnage de animation.py (-1 : pas d'animation)
+        ("clip", np.int16),
+        ("clip_time", np.float64),
+        ("frame_end", np.float64),  # Temps du clip où l'image affichée se termine
+        ("image", np.int32),      # Image de l'atlas à afficher
+        ("walking", np.bool_),    # Marche commandée sans vitesse dans le stockage (joueur)
+        ("wander_timer", np.float64),
+        ("width", np.int16),
+        ("height", np.int16),
+        ("feet_w", np.int16),
+        ("feet_h", np.int16),
+        ("alive", np.bool_),
+        ("ai", np.bool_),  # Déplacement automatique (pnj)
+    )
+
+    def __init__(self, capacity=64, seed=None):
+        self.capacity = 0
+        self.count = 0  # Nombre de lignes utilisées (vivantes ou libérées)
+        self.free = []
+        self.rng = np.random.default_rng(seed)
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        for name, dtype in self.COLUMNS:
+            array = self.__dict__.get(name)
+            new = np.zeros(capacity, dtype=dtype)
+            if array is not None:
+                new[:len(array)] = array
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def snapshot(self):
+        """Copie des colonnes (lignes utilisées), qui ne bouge plus quand les entités avancent"""
+        n = self.count
+        return {name: getattr(self, name)[:n].copy() for name, _ in self.COLUMNS}
+
+    def restore(self, columns, free):
+        """Remplace l'état de toutes les entités par des colonnes copiées (``snapshot``).
+
+        Une colonne absente des données reste à zéro, une colonne inconnue est ignorée.
+        """
+        count = max((len(values) for values in columns.values()), default=0)
+        if count > self.capacity:
+            self._grow(max(count, self.capacity * 2))
+        for name, _ in self.COLUMNS:
+            array = getattr(self, name)
+            array[:] = 0
+            values = columns.get(name)
+            if values is not None:
+                array[:len(values)] = values
+        self.count = count
+        self.free = list(free)
+
+    def spawn(self, x, y, size, feet_size, speed=0, ai=False):
+        """Ajoute une entité et renvoie son identifiant (indice de ligne)"""
+        if self.free:
+            i = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self._grow(self.capacity * 2)
+            i = self.count
+            self.count += 1
+
+        self.x[i] = self.old_x[i] = x
+        self.y[i] = self.old_y[i] = y
+        self.vx[i] = self.vy[i] = 0
+        self.speed[i] = speed
+        self.direction[i] = DOWN
+        self.character[i] = -1
+        self.clip[i] = -1
+        self.clip_time[i] = self.frame_end[i] = 0
+        self.image[i] = 0
+        self.walking[i] = False
+        self.wander_timer[i] = 0
+        self.width[i], self.height[i] = size
+        self.feet_w[i], self.feet_h[i] = feet_size
+        self.alive[i] = True
+        self.ai[i] = ai
+        return i
+
+    def despawn(self, i):
+        self.alive[i] = False
+        self.ai[i] = False
+        self.free.append(i)
+
+    def active_ids(self):
+        """Identifiants des entités vivantes"""
+        return np.flatnonzero(self.alive[:self.count])
+
+    def wander(self, dt, min_delay=0.5, max_delay=2.5):
+        """Choisit au hasard une nouvelle direction (ou l'arrêt) pour les pnj dont le délai expire"""
+        n = self.count
+        timer = self.wander_timer[:n]
+        timer -= dt
+        ready = np.flatnonzero(self.ai[:n] & (timer <= 0))
+        if not len(ready):
+            return
+        # 0..3 : une direction, 4 : immobile
+        choice = self.rng.integers(0, 5, len(ready))
+        self.set_direction(ready, choice)
+        timer[ready] = self.rng.uniform(min_delay, max_delay, len(ready))
+
+    def set_direction(self, ids, choice):
+        """Oriente les entités ``ids`` (0..3 = direction, 4 = arrêt) à leur vitesse"""
+        speed = self.speed[ids]
+        moving = choice < 4
+        self.vx[ids] = np.where(choice == RIGHT, speed, np.where(choice == LEFT, -speed, 0.0))
+        self.vy[ids] = np.where(choice == DOWN, speed, np.where(choice == UP, -speed, 0.0))
+        self.direction[ids] = np.where(moving, choice, self.direction[ids])
+
+    def step(self, dt):
+        """Avance les positions de toutes les entités d'un pas dt"""
+        n = self.count
+        alive = self.alive[:n]
+        x, y = self.x[:n], self.y[:n]
+        self.old_x[:n] = x
+        self.old_y[:n] = y
+        vx, vy = self.vx[:n], self.vy[:n]
+        x += np.where(alive, vx, 0) * dt
+        y += np.where(alive, vy, 0) * dt
+
+    def feet(self):
+        """Rectangles des pieds (left, top, w, h) de toutes les entités, en tableaux"""
+        n = self.count
+        left = self.x[:n] + (self.width[:n] - self.feet_w[:n]) // 2
+        top = self.y[:n] + self.height[:n] - self.feet_h[:n]
+        return left.astype(np.int64), top.astype(np.int64), self.feet_w[:n], self.feet_h[:n]
+
+    def broad_phase(self, cell_size, occupied):
+        """Indices des entités dont les pieds touchent une case ``occupied`` de la grille.
+
+        ``occupied`` est un tableau booléen (lignes, colonnes) des cases de
+        ``cell_size`` pixels qui contiennent au moins un mur : seules les
+        entités renvoyées ont besoin d'un test précis.
+        """
+        # Zone balayée par les pieds depuis le pas précédent
+        n = self.count
+        left, top, w, h = self.feet()
+        move_x = (self.x[:n] - self.old_x[:n]).astype(np.int64)
+        move_y = (self.y[:n] - self.old_y[:n]).astype(np.int64)
+        left, right = left + np.minimum(move_x, 0) - 1, left + w + np.maximum(move_x, 0) + 1
+        top, bottom = top + np.minimum(move_y, 0) - 1, top + h + np.maximum(move_y, 0) + 1
+
+        rows, cols = occupied.shape
+        x0 = np.clip(left // cell_size, 0, cols - 1)
+        y0 = np.clip(top // cell_size, 0, rows - 1)
+        x1 = np.clip((right - 1) // cell_size, 0, cols - 1)
+        y1 = np.clip((bottom - 1) // cell_size, 0, rows - 1)
+        # Zone plus petite qu'une case : au plus 4 cases touchées ; les
+        # entités plus rapides sont toujours testées précisément
+        hit = occupied[y0, x0] | occupied[y0, x1] | occupied[y1, x0] | occupied[y1, x1]
+        hit |= (x1 - x0 > 1) | (y1 - y0 > 1)
+        return np.flatnonzero(hit & self.alive[:n])
+
+
+def occupancy_grid(spatial_hash, kind="wall"):
+    """Grille booléenne (lignes, colonnes) des cases d'un SpatialHash qui contiennent une entrée"""
+    cells = [(cx, cy) for (entry_kind, cx, cy), bucket in spatial_hash.cells.items()
+             if entry_kind == kind and bucket and cx >= 0 and cy >= 0]
+    grid = np.zeros((max((cy for _, cy in cells), default=0) + 1,
+                     max((cx for cx, _ in cells), default=0) + 1), dtype=np.bool_)
+    for cx, cy in cells:
+        grid[cy, cx] = True
+    return grid
+
+
+class EntityPosition:
+    """Position [x, y] d'une entité, lue et écrite directement dans le stockage"""
+    __slots__ = ("store", "id")
+
+    def __init__(self, store, entity_id):
+        self.store = store
+        self.id = entity_id
+
+    def __getitem__(self, index):
+        if index == 0:
+            return float(self.store.x[self.id])
+        if index == 1:
+            return float(self.store.y[self.id])
+        raise IndexError(index)
+
+    def __setitem__(self, index, value):
+        if index == 0:
+            self.store.x[self.id] = value
+        elif index == 1:
+            self.store.y[self.id] = value
+        else:
+            raise IndexError(index)
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        yield self[0]
+        yield self[1]
+
+    def copy(self):
+        return [self[0], self[1]]
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class Npc(pygame.sprite.Sprite):
+    """Personnage non joueur : un sprite dont l'état vit dans l'EntityStore"""
+
+    def __init__(self, store, x, y, sheet, frame_size=(31, 32), speed=60, name=None, dialog=None):
+        super().__init__()
+        self.name = name
+        self.dialog = dialog  # Réplique quand le joueur lui parle
+        # Clips du descripteur de la feuille (sinon 3 images par direction de frame_size)
+        self.animation = library().character(sheet, frame_size=frame_size)
+        self.store = store
+        self.id = store.spawn(x, y, frame_size, (frame_size[0] // 2, 8), speed=speed, ai=True)
+        self.animation.attach(store, self.id)
+        self.image = self.animation.image
+        self.rect = self.image.get_rect(topleft=(x, y))
+        self.feet = pygame.Rect(0, 0, frame_size[0] // 2, 8)
+
+        # Chemin à suivre (points en pixels) et demande de chemin en cours
+        self.path = None
+        self.path_request = None
+
+    def update(self):
+        store, i = self.store, self.id
+        self.rect.topleft = (store.x[i], store.y[i])
+        self.feet.midbottom = self.rect.midbottom
+        self.image = self.animation.library.atlas.images[store.image[i]]
+
+    def interpolate(self, alpha):
+        store, i = self.store, self.id
+        x = store.old_x[i] + (store.x[i] - store.old_x[i]) * alpha
+        y = store.old_y[i] + (store.y[i] - store.old_y[i]) * alpha
+        self.rect.topleft = (round(x), round(y))
+
+    def follow(self, path):
+        """Suit un chemin : le pnj ne se promène plus au hasard jusqu'au bout"""
+        self.path = list(path) if path else None
+        self.store.ai[self.id] = self.path is None
+
+    def steer(self, tolerance=2):
+        """Oriente le pnj vers la prochaine étape de son chemin"""
+        x, y = self.feet.center
+        while self.path:
+            dx, dy = self.path[0][0] - x, self.path[0][1] - y
+            if abs(dx) > tolerance or abs(dy) > tolerance:
+                break
+            # Étape atteinte : recalage exact sur le centre de la case, les
+            # pieds faisant presque la largeur d'une case
+            self.store.x[self.id] += dx
+            self.store.y[self.id] += dy
+            x, y = self.path.pop(0)
+        if not self.path:
+            # Arrivé : arrêt, puis reprise de la promenade
+            self.store.set_direction([self.id], np.array([4]))
+            self.follow(None)
+            return
+        if abs(dx) > tolerance:
+            choice = RIGHT if dx > 0 else LEFT
+        else:
+            choice = DOWN if dy > 0 else UP
+        self.store.set_direction([self.id], np.array([choice]))
+
+    def save_location(self):
+        pass
+
+    def resolve_movement(self, colliders):
+        store, i = self.store, self.id
+        offset = (self.feet.x - self.rect.x, self.feet.y - self.rect.y)
+        return slide(self, (store.old_x[i], store.old_y[i]), offset, colliders)
+
+    def kill(self):
+        super().kill()
+        if self.store.alive[self.id]:
+            self.store.despawn(self.id)
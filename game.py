@@ -1,12 +1,35 @@
+import os
+import random
 import pygame
-import pytmx
-import pyscroll
 import time
+import savegame
+from animation import library
+from assets import AssetManager
+from controls import Controls, direction
+from dialog import DialogEngine
+from entities import EntityStore, Npc
+from levels import REACH, LevelRegistry
+from menus import Menu
+from navigation import PathService
 from player import Player
+from profiler import Profiler
+from render import CameraGroup
+from replay import InputRecorder, KeyState
+from sprites import Chest, prescale
+from text import HudText, TextCache
+from triggers import TriggerSystem
 
 class Game:
 
-    def __init__(self):
+    def __init__(self, collision_mode="objets", sim_rate=60, render_rate=60, headless=False,
+                 metrics_path=None, start_map="map.tmx", compiled_levels=True, seed=None,
+                 record_path=None, deterministic=False, save_path="sauvegarde.sav"):
+        # Mode sans fenêtre (tests de performance, CI) : pilotes SDL factices
+        self.headless = headless
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+
         # Initialisation de pygame
         pygame.init()
         
@@ -16,122 +39,171 @@ class Game:
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption("Adventure-Game prototype")
         
-        # Charger l'image de fond
-        self.background = pygame.image.load("background.jpeg").convert()
-        
         # Police pour les menus
         self.font = pygame.font.Font(None, 36)
+        self.pause_overlay = None
+
+        # Textes rendus une seule fois, partagés par le HUD, les écrans et les menus
+        self.text_cache = TextCache()
+        self.hud_timer = HudText(self.text_cache, self.font, "Temps: {}", (255, 255, 255),
+                                 center=(self.screen_width - 100, 30))
         
-        # Initialisation des éléments du jeu
-        self.init_game()
+        # Cadences : simulation à pas fixe, affichage indépendant (0 = sans limite)
+        self.sim_rate = sim_rate
+        self.render_rate = render_rate
+        self.max_sim_steps = 5  # Pas de simulation maximum par image affichée
+
+        # Mesures par frame (F3 : overlay), exportées en JSON lines si metrics_path
+        self.profiler = Profiler(export_path=metrics_path)
+
+        # Mode de collision : "objets" (rectangles dessinés dans Tiled)
+        # ou "tuiles" (carte générée à partir du calque walls)
+        self.collision_mode = collision_mode
 
-        # Ajout du compte à rebours
-        self.countdown_time = 30  # Secondes
+        # Cache des niveaux (chaque tmx n'est analysé qu'une fois, ou relu
+        # depuis sa version compilée par levelcache.py si elle est à jour)
+        self.levels = LevelRegistry(self.screen.get_size(), zoom=1.5, use_compiled=compiled_levels)
+
+        # Horloge de simulation : avance de dt à chaque pas, indépendamment de
+        # l'heure réelle, pour que les parties enregistrées soient reproductibles
+        self.sim_time = 0.0
+
+        # Ajout du compte à rebours (propriété « countdown » de la carte, en secondes)
+        self.countdown_time = None
         self.start_time = 0
         self.game_over = False
         self.level_completed = False
-        self.current_map = "map.tmx" # Pour suivre la carte actuelle
+        self.current_map = None # Pour suivre la carte actuelle
+        self.collision_count = 0  # Pas où le joueur a été arrêté par un mur
+
+        # État du joueur et des pnj, mis à jour par lots (graine notée dans les enregistrements)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.entities = EntityStore(seed=self.seed)
+        self.animations = library()  # Clips et atlas partagés par tous les personnages
+        self.npcs = {}  # identifiant d'entité -> Npc de la carte courante
+
+        # Chemins des pnj calculés hors de la boucle principale ; une partie
+        # enregistrée ou rejouée les attend pour rester reproductible
+        self.navigation = PathService()
+        self.deterministic = deterministic or record_path is not None
+
+        # Commandes (touches -> actions) et volumes déclencheurs du niveau courant :
+        # portails, objectif et objets interactifs ne sont testés qu'aux changements de case
+        self.controls = Controls()
+        self.triggers = TriggerSystem()
+        self.triggers.on("portal", enter=self.enter_portal)
+        self.triggers.on("goal", enter=self.reach_goal)
+        self.triggers.on("coffre", interact=self.open_chest)
+        self.triggers.on("panneau", interact=self.read_sign)
+        self.opened_chests = set()  # (carte, nom) des coffres déjà ouverts
+
+        # Fond des menus et première carte chargés en arrière-plan, derrière un écran de chargement
+        self.assets = AssetManager()
+
+        # Dialogues : scripts lus par carte, pages préparées une fois (voir dialog.py)
+        self.dialogs = DialogEngine(self.assets, (self.screen_width, self.screen_height))
+        self.dialog = None  # Conversation affichée
+        self.show_loading_screen([self.assets.load_image("background.jpeg"),
+                                  self.assets.load_level(self.levels, start_map)])
+        self.background = self.assets.image("background.jpeg")
+
+        # Initialisation des éléments du jeu
+        self.start_map = start_map
+        self.init_game(start_map)
+
+        # Enregistrement des entrées de chaque pas (relecture avec replay.py)
+        self.recorder = None
+        if record_path is not None:
+            self.recorder = InputRecorder(record_path, start_map=start_map, seed=self.seed,
+                                          sim_rate=sim_rate, collision_mode=collision_mode)
+
+        # Sauvegarde de la partie (voir savegame.py) : en quittant, et automatiquement pendant le jeu
+        self.save_path = save_path
+        self.autosaver = None
 
         # Initialisation audio
-        pygame.mixer.init()
         self.volume = 0.5  # Volume par défaut (50%)
+        self.music_enabled = True
         self.background_music = None
-        self.load_music()
-        
+
         # Chargement des paramètres
         self.load_settings()
 
+        if not headless:
+            pygame.mixer.init()
+            self.load_music()
+
+    def show_loading_screen(self, futures):
+        """Affiche la progression jusqu'à ce que tous les chargements ``futures`` soient finis"""
+        if not self.headless:
+            clock = pygame.time.Clock()
+            bar = pygame.Rect(0, 0, 400, 24)
+            bar.center = (self.screen_width // 2, self.screen_height // 2 + 40)
+            while True:
+                progress = self.assets.progress(futures)
+                self.screen.fill((60, 30, 50))
+                self.draw_text("Chargement...", (255, 255, 255), self.screen_width // 2, self.screen_height // 2)
+                pygame.draw.rect(self.screen, (255, 255, 255), bar, 2)
+                self.screen.fill((255, 255, 0), (bar.x + 4, bar.y + 4, int((bar.width - 8) * progress), bar.height - 8))
+                pygame.display.flip()
+                if progress >= 1:
+                    break
+                pygame.event.pump()  # La fenêtre reste réactive pendant le chargement
+                clock.tick(30)
+        # Propager les erreurs de chargement
+        for future in futures:
+            future.result()
+
     def load_music(self):
-        """Charge la musique avec le volume actuel"""
-        try:
-            # Essayez d'abord .ogg puis .wav
+        """Prépare la musique de fond, lue en flux par pygame.mixer.music (rien n'est décodé d'avance)"""
+        self.close_music()
+        errors = []
+        for path in ("sounds/background.ogg", "sounds/background.wav"):
+            try:
+                # Fichier ouvert plutôt que chemin : SDL_mixer reconnaît le format
+                # au contenu (sounds/background.ogg est en fait un mp3)
+                music = open(path, "rb")
+            except OSError as e:
+                errors.append(str(e))
+                continue
             try:
-                self.background_music = pygame.mixer.Sound("sounds/background.ogg")
-            except:
-                self.background_music = pygame.mixer.Sound("sounds/background.wav")
-            self.background_music.set_volume(self.volume)
-        except Exception as e:
-            print(f"Erreur chargement musique: {e}")
+                pygame.mixer.music.load(music)
+            except pygame.error as e:
+                music.close()
+                errors.append(f"{path}: {e}")
+                continue
+            pygame.mixer.music.set_volume(self.volume)
+            self.background_music = music  # Le flux lit ce fichier jusqu'à close_music
+            return
+        print(f"Erreur chargement musique: {'; '.join(errors)}")
+
+    def close_music(self):
+        """Arrête la musique et ferme le fichier lu en flux"""
+        if self.background_music:
+            pygame.mixer.music.stop()
+            pygame.mixer.music.unload()
+            self.background_music.close()
             self.background_music = None
 
     def play_background_music(self):
         """Joue la musique en boucle"""
-        if self.background_music:
-            self.background_music.play(loops=-1)  # -1 = boucle infinie
+        if self.background_music and self.music_enabled:
+            pygame.mixer.music.play(loops=-1)  # -1 = boucle infinie
 
-
-    def show_options_menu(self):
-        """Menu options avec contrôle du volume"""
-        options_active = True
-        selected = 0
-        options = [
-            f"Musique: {'ON' if self.background_music else 'OFF'}",
-            f"Volume: [{'=' * int(self.volume * 10)}{' ' * (10 - int(self.volume * 10))}]",
-            "Plein écran",
-            "Retour"
-        ]
-         
-        while options_active:
-            self.screen.fill((60, 30, 50))
-            
-            # Affichage titre
-            title = self.font.render("OPTIONS", True, (255, 255, 255))
-            self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, 100))
-            
-            # Affichage options
-            for i, option in enumerate(options):
-                color = (255, 255, 0) if i == selected else (255, 255, 255)
-                text = self.font.render(option, True, color)
-                self.screen.blit(text, (self.screen_width//2 - text.get_width()//2, 200 + i*40))
-            
-            pygame.display.flip()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    options_active = False
-                
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_DOWN:
-                        selected = (selected + 1) % len(options)
-                    elif event.key == pygame.K_UP:
-                        selected = (selected - 1) % len(options)
-                    elif event.key == pygame.K_LEFT:
-                        if selected == 0:  # Activer/désactiver musique
-                            if self.background_music:
-                                self.background_music.stop()
-                                self.background_music = None
-                            else:
-                                self.load_music()
-                                self.play_background_music()
-                        elif selected == 1:  # Diminuer volume
-                            self.update_volume(self.volume - 0.1)
-                    elif event.key == pygame.K_RIGHT:
-                        if selected == 0:  # Activer/désactiver musique
-                            if not self.background_music:
-                                self.load_music()
-                                self.play_background_music()
-                        elif selected == 1:  # Augmenter volume
-                            self.update_volume(self.volume + 0.1)
-                    elif event.key == pygame.K_RETURN:
-                        if selected == 2:  # Plein écran
-                            self.toggle_fullscreen()
-                        elif selected == 3:  # Retour
-                            options_active = False
-                    elif event.key == pygame.K_ESCAPE:
-                        options_active = False
-                    
-                    # Mise à jour de l'affichage
-                    options = [
-                        f"Musique: {'ON' if self.background_music else 'OFF'}",
-                        f"Volume: [{'=' * int(self.volume * 10)}{' ' * (10 - int(self.volume * 10))}]",
-                        "Plein écran",
-                        "Retour"
-                    ]
+    def toggle_music(self):
+        """Coupe ou remet la musique ; le flux est simplement relancé, sans rechargement"""
+        self.music_enabled = not self.music_enabled
+        if self.music_enabled:
+            self.play_background_music()
+        elif self.background_music:
+            pygame.mixer.music.stop()
 
     def save_settings(self):
         """Sauvegarde les paramètres"""
         with open('settings.ini', 'w') as f:
             f.write(f"volume={self.volume}\n")
+            f.write(f"music={int(self.music_enabled)}\n")
+            self.controls.save(f)
 
     def load_settings(self):
         """Charge les paramètres"""
@@ -140,38 +212,83 @@ class Game:
                 for line in f:
                     if line.startswith('volume='):
                         self.volume = float(line.split('=')[1])
+                    elif line.startswith('music='):
+                        self.music_enabled = line.split('=')[1].strip() == '1'
+                    else:
+                        name, _, value = line.strip().partition('=')
+                        self.controls.load(name, value)  # Touches : key_<action>=...
         except:
             pass  # Fichier non trouvé, on garde les valeurs par défaut
 
-    def init_game(self):
+    def init_game(self, start_map="map.tmx"):
         """Initialise les éléments du jeu"""
-        # charger la carte (tmx)
-        tmx_data = pytmx.util_pygame.load_pygame("map.tmx")
-        map_data = pyscroll.data.TiledMapData(tmx_data)
-        map_layer = pyscroll.orthographic.BufferedRenderer(map_data, self.screen.get_size())
-        map_layer.zoom = 1.5
+        level = self.levels.get(start_map)
 
         # generer le joueur
-        player_position = tmx_data.get_object_by_name("positionInit")
-        self.player = Player(player_position.x, player_position.y)
+        x, y = level.get_position(level.spawn)
+        self.player = Player(x, y, self.entities)
 
-        # Definir la liste de rectangle de collision
-        self.walls = []
+        self.travel(start_map, level.spawn, offset=0)
 
-        for obj in tmx_data.objects:
-            if obj.type == "collision":
-                self.walls.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
+    def load_level(self, filename):
+        """Installe un niveau du cache : collisions et groupe de calques"""
+        level = self.levels.get(filename)
+        map_layer = self.levels.get_renderer(filename)
+        self.level = level
+
+        # Definir la liste de rectangle de collision
+        self.walls = level.walls
+        self.index = level.index
+        if self.collision_mode == "tuiles" and level.wall_bitmap is not None:
+            self.colliders = level.wall_bitmap
+            self.grid_mode = "tuiles"
+        else:
+            self.colliders = level.index
+            self.grid_mode = "objets"
 
         # Dessinner le groupe de calque
-        self.group = pyscroll.PyscrollGroup(map_layer=map_layer, default_layer=4)
+        scale = getattr(map_layer.data, "scale", 1)
+        self.group = CameraGroup(map_layer=map_layer, default_layer=4, scale=scale)
         self.group.add(self.player)
 
-        # Definir le rectangle de collision pour aller au level1
-        enter_l1 = tmx_data.get_object_by_name('enter_l1')
-        self.enter_l1_rect = pygame.Rect(enter_l1.x, enter_l1.y, enter_l1.width, enter_l1.height)
-
-        # Démarrer le compte à rebours lorsque le jeu commence (ou le niveau)
-        self.start_time = time.time()
+        # Les pnj de la carte précédente disparaissent, ceux de la nouvelle apparaissent
+        self.navigation.set_level(level)
+        self.triggers.set_level(level)
+        self.dialogs.load(filename)
+        for npc in self.npcs.values():
+            npc.kill()
+        self.npcs = {}
+        for obj in level.npcs:
+            npc = Npc(self.entities, obj.x, obj.y,
+                      obj.properties.get("sprite", "ressources/assets/pnjs/paul.png"),
+                      speed=obj.properties.get("speed", 60), name=obj.name,
+                      dialog=obj.properties.get("dialog"))
+            self.npcs[npc.id] = npc
+            self.group.add(npc)
+            # Propriété « goto » : le pnj se rend jusqu'à l'objet nommé
+            goto = obj.properties.get("goto")
+            if goto is not None:
+                npc.update()
+                npc.path_request = self.navigation.request(npc.feet.center, level.get_position(goto))
+
+        # Coffres, restés ouverts si le joueur les a déjà ouverts
+        self.chests = {}
+        for trigger in level.triggers:
+            if trigger.kind == "coffre":
+                opened = (filename, trigger.name) in self.opened_chests
+                chest = Chest(trigger.item.x, trigger.item.y, opened)
+                self.chests[trigger.name] = chest
+                self.group.add(chest)
+
+        # Images de l'atlas (joueur, pnj, coffres) agrandies dès le chargement, pas à la première frame
+        if scale != 1:
+            prescale(self.animations.atlas.images, scale)
+
+        # Précharger en arrière-plan les cartes accessibles par un portail
+        for neighbour in level.neighbours():
+            self.levels.prefetch(neighbour)
+
+        return level
 
     def toggle_fullscreen(self):
         """Basculer entre plein écran et fenêtré"""
@@ -183,306 +300,359 @@ class Game:
 
     def show_main_menu(self):
         """Affiche le menu principal"""
-        menu_active = True
-        selected = 0
-        options = ["Jouer", "Options", "Quitter"]
-        
-        while menu_active:
-            self.screen.fill((60, 30, 50))
-            self.screen.blit(self.background, (150, 150))
-            
-            # Titre
-            title = self.font.render("ADVENTURE GAME", True, (255, 255, 255))
-            self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, 100))
-            
-            # Options du menu
-            for i, option in enumerate(options):
-                color = (255, 255, 0) if i == selected else (255, 255, 255)
-                text = self.font.render(option, True, color)
-                self.screen.blit(text, (self.screen_width//2 - text.get_width()//2, 250 + i*50))
-            
-            pygame.display.flip()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_DOWN:
-                        selected = (selected + 1) % len(options)
-                    elif event.key == pygame.K_UP:
-                        selected = (selected - 1) % len(options)
-                    elif event.key == pygame.K_RETURN:
-                        if selected == 0:  # Jouer
-                            return True
-                        elif selected == 1:  # Options
-                            self.show_options_menu()
-                        elif selected == 2:  # Quitter
-                            return False
-                    elif event.key == pygame.K_ESCAPE:
-                        return False
+        def draw_background(screen):
+            screen.fill((60, 30, 50))
+            screen.blit(self.background, (150, 150))
 
+        # « Continuer » reprend la dernière sauvegarde (pas pendant un enregistrement,
+        # qui doit partir de la carte de départ)
+        options = ["Jouer", "Options", "Quitter"]
+        if self.recorder is None and self.save_path and os.path.exists(self.save_path):
+            options.insert(0, "Continuer")
+
+        def on_select(selected):
+            choice = options[selected]
+            if choice == "Continuer":
+                return self.continue_game()
+            elif choice == "Jouer":
+                return True
+            elif choice == "Options":
+                self.show_options_menu()
+            elif choice == "Quitter":
+                return False
+
+        menu = Menu(self, "ADVENTURE GAME", options, 100, 250, 50, draw_background)
+        return menu.run(on_select)
+
+    def continue_game(self):
+        """Reprend la partie sauvegardée ; renvoie False si la sauvegarde est illisible"""
+        try:
+            snapshot = savegame.read(self.save_path)
+            self.show_loading_screen([self.assets.load_level(self.levels, snapshot.header["map"])])
+            savegame.restore(self, snapshot)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Erreur chargement sauvegarde: {e}")
+            return None  # Rester dans le menu
         return True
 
     def show_options_menu(self):
         """Affiche le menu des options"""
-        options_active = True
-        selected = 0
-        options = ["Plein écran", "Retour"]
-        
-        while options_active:
-            self.screen.fill((60, 30, 50))
-            
-            # Titre
-            title = self.font.render("OPTIONS", True, (255, 255, 255))
-            self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, 100))
-            
-            # Options
-            for i, option in enumerate(options):
-                color = (255, 255, 0) if i == selected else (255, 255, 255)
-                text = self.font.render(option, True, color)
-                self.screen.blit(text, (self.screen_width//2 - text.get_width()//2, 250 + i*50))
-            
-            pygame.display.flip()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    options_active = False
-                
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_DOWN:
-                        selected = (selected + 1) % len(options)
-                    elif event.key == pygame.K_UP:
-                        selected = (selected - 1) % len(options)
-                    elif event.key == pygame.K_RETURN:
-                        if selected == 0:  # Plein écran
-                            self.toggle_fullscreen()
-                        elif selected == 1:  # Retour
-                            options_active = False
-                    elif event.key == pygame.K_ESCAPE:
-                        options_active = False
+        def draw_background(screen):
+            screen.fill((60, 30, 50))
 
-    def show_pause_menu(self):
-        """Affiche le menu pause"""
-        pause_active = True
-        selected = 0
-        options = ["Reprendre", "Options", "Quitter"]
-        
-        while pause_active:
-            # Créer une surface semi-transparente
-            overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 128))
-            self.screen.blit(overlay, (0, 0))
-            
-            # Titre
-            title = self.font.render("PAUSE", True, (255, 255, 255))
-            self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, 200))
-            
-            # Options du menu
-            for i, option in enumerate(options):
-                color = (255, 255, 0) if i == selected else (255, 255, 255)
-                text = self.font.render(option, True, color)
-                self.screen.blit(text, (self.screen_width//2 - text.get_width()//2, 300 + i*50))
-            
-            pygame.display.flip()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_DOWN:
-                        selected = (selected + 1) % len(options)
-                    elif event.key == pygame.K_UP:
-                        selected = (selected - 1) % len(options)
-                    elif event.key == pygame.K_RETURN:
-                        if selected == 0:  # Reprendre
-                            return True
-                        elif selected == 1:  # Options
-                            self.show_options_menu()
-                        elif selected == 2:  # Quitter
-                            return False
-                    elif event.key == pygame.K_ESCAPE:
-                        return True
+        def music_label():
+            return "Musique : oui" if self.music_enabled else "Musique : non"
 
-        return True
+        def on_select(selected):
+            if selected == 0:  # Plein écran
+                self.toggle_fullscreen()
+            elif selected == 1:  # Musique
+                self.toggle_music()
+                menu.set_options(["Plein écran", music_label(), "Retour"])
+            elif selected == 2:  # Retour
+                return True
 
+        menu = Menu(self, "OPTIONS", ["Plein écran", music_label(), "Retour"], 100, 250, 50, draw_background,
+                    quit_value=True, escape_value=True)
+        menu.run(on_select)
 
-    def handle_input(self):
-        pressed = pygame.key.get_pressed()
-        
-        # Réinitialise l'état de mouvement
-        self.player.moving = False
-        
-        if pressed[pygame.K_UP]:
-            self.player.move_up()
-        elif pressed[pygame.K_DOWN]:
-            self.player.move_down()
-        elif pressed[pygame.K_LEFT]:
-            self.player.move_left()
-        elif pressed[pygame.K_RIGHT]:
-            self.player.move_right()
+    def show_pause_menu(self):
+        """Affiche le menu pause"""
+        # Image du jeu au moment de la pause, assombrie une seule fois
+        if self.pause_overlay is None:
+            self.pause_overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
+            self.pause_overlay.fill((0, 0, 0, 128))
+        snapshot = self.screen.copy()
+        snapshot.blit(self.pause_overlay, (0, 0))
+
+        def draw_background(screen):
+            screen.blit(snapshot, (0, 0))
+
+        def on_select(selected):
+            if selected == 0:  # Reprendre
+                return True
+            elif selected == 1:  # Options
+                self.show_options_menu()
+            elif selected == 2:  # Quitter
+                return False
+
+        menu = Menu(self, "PAUSE", ["Reprendre", "Options", "Quitter"], 200, 300, 50, draw_background,
+                    quit_value=False, escape_value=True)
+        return menu.run(on_select)
+
+    def handle_input(self, dt, pressed=None):
+        # pressed : état des commandes indexable par action (par défaut les touches
+        # tenues ; état scripté ou relu en mode sans fenêtre)
+        if pressed is None:
+            pressed = self.controls
+
+        dx, dy = direction(pressed)
+        if dx or dy:
+            self.player.move(dx, dy, dt)
         else:
             # Si aucune touche de mouvement n'est pressée
             self.player.stop_moving()
 
-    def switch_level(self):
-        # charger la carte (tmx)
-        tmx_data = pytmx.util_pygame.load_pygame("level1.tmx")
-        map_data = pyscroll.data.TiledMapData(tmx_data)
-        map_layer = pyscroll.orthographic.BufferedRenderer(map_data, self.screen.get_size())
-        map_layer.zoom = 1.5
-
-        tmx_data = pytmx.util_pygame.load_pygame("level1.tmx") # Assurez-vous que c'est bien level1.tmx
-        self.current_map = "level1.tmx" # Mettre à jour la carte actuelle
-        self.start_time = time.time()  # Réinitialiser le timer pour le nouveau niveau
-        self.level_completed = False # Réinitialiser le drapeau
-
-        # Definir la liste de rectangle de collision
-        self.walls = []
-
-        for obj in tmx_data.objects:
-            if obj.type == "collision":
-                self.walls.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
-
-        # Dessinner le groupe de calque
-        self.group = pyscroll.PyscrollGroup(map_layer=map_layer, default_layer=4)
-        self.group.add(self.player)
-
-        # Definir le rectangle de collision pour revenir à la map
-        enter_l1 = tmx_data.get_object_by_name('exit_level')
-        self.enter_l1_rect = pygame.Rect(enter_l1.x, enter_l1.y, enter_l1.width, enter_l1.height)
-
-        # Recuperation des points de spawn
-        spawn_point = tmx_data.get_object_by_name('spawn_player')
-        self.player.position[0] = spawn_point.x
-        self.player.position[1] = spawn_point.y + 5
-
-    def switch_map(self):
-        # charger la carte (tmx)
-        tmx_data = pytmx.util_pygame.load_pygame("map.tmx")
-        map_data = pyscroll.data.TiledMapData(tmx_data)
-        map_layer = pyscroll.orthographic.BufferedRenderer(map_data, self.screen.get_size())
-        map_layer.zoom = 1.5
-
-        tmx_data = pytmx.util_pygame.load_pygame("map.tmx")
-        self.current_map = "map.tmx" # Mettre à jour la carte actuelle
-        self.start_time = time.time() # Réinitialiser le timer
+    def interact(self):
+        """Action « interact » : fait avancer le dialogue, ou agit sur ce qui est à portée du joueur"""
+        if self.dialog is not None:
+            if not self.dialog.advance():
+                self.dialog = None
+            return
+        # Volumes où se trouve déjà le joueur (coffre, panneau...), sinon pnj à portée
+        if self.triggers.interact(self.player.id):
+            return
+        reach = self.player.feet.inflate(2 * REACH, 2 * REACH)
+        for npc in self.npcs.values():
+            if npc.dialog and reach.colliderect(npc.rect):
+                speaker = npc.name.capitalize() if npc.name else None
+                self.dialog = self.dialogs.open(self.current_map, npc.dialog, speaker)
+                return
+
+    def enter_portal(self, trigger, entity):
+        portal = trigger.item
+        self.travel(portal.target_map, portal.target_spawn)
+        return True  # Sortir après le changement de niveau
+
+    def reach_goal(self, trigger, entity):
+        self.level_completed = True  # Le joueur a atteint l'objectif
+        return True  # Sortir pour afficher "Niveau Terminé"
+
+    def open_chest(self, trigger, entity):
+        key = (self.current_map, trigger.name)
+        if key in self.opened_chests:
+            self.dialog = self.dialogs.text("Le coffre est vide.")
+            return
+        self.opened_chests.add(key)
+        self.chests[trigger.name].open()
+        self.dialog = self.dialogs.text(f"Vous trouvez : {trigger.properties.get('contenu', 'rien')}")
+
+    def read_sign(self, trigger, entity):
+        self.dialog = self.dialogs.open(self.current_map, trigger.properties.get("dialog", ""))
+
+    def enter_level(self, filename):
+        """Fait de ``filename`` la carte courante, compte à rebours relancé"""
+        level = self.load_level(filename)
+        self.current_map = filename # Mettre à jour la carte actuelle
+        self.countdown_time = level.countdown
+        self.start_time = self.sim_time  # Réinitialiser le timer pour le nouveau niveau
         self.game_over = False
-        self.level_completed = False
-
-        # Definir la liste de rectangle de collision
-        self.walls = []
-
-        for obj in tmx_data.objects:
-            if obj.type == "collision":
-                self.walls.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
-
-        # Dessinner le groupe de calque
-        self.group = pyscroll.PyscrollGroup(map_layer=map_layer, default_layer=4)
-        self.group.add(self.player)
+        self.level_completed = False # Réinitialiser le drapeau
+        self.dialog = None
+        return level
 
-        # Definir le rectangle de collision pour revenir à la map
-        enter_l1 = tmx_data.get_object_by_name('enter_l1')
-        self.enter_l1_rect = pygame.Rect(enter_l1.x, enter_l1.y, enter_l1.width, enter_l1.height)
+    def travel(self, filename, spawn, offset=5):
+        """Passe sur la carte ``filename``, le joueur apparaissant sur l'objet ``spawn``"""
+        level = self.enter_level(filename)
 
         # Recuperation des points de spawn
-        spawn_point = tmx_data.get_object_by_name('spawn_map')
-        self.player.position[0] = spawn_point.x
-        self.player.position[1] = spawn_point.y + 5
+        x, y = level.get_position(spawn)
+        self.player.position[0] = x
+        self.player.position[1] = y + offset
+        self.player.save_location()
+        self.player.update()
 
     def draw_text(self, text, color, x, y):
-        text_surface = self.font.render(text, True, color)
+        text_surface = self.text_cache.render(self.font, text, color)
         text_rect = text_surface.get_rect(center=(x, y))
         self.screen.blit(text_surface, text_rect)
 
-    def update(self):
+    def update(self, dt=None):
         if self.game_over or self.level_completed:
             return # Ne rien mettre à jour si le jeu est terminé ou le niveau est complet
 
-        self.group.update()
+        dt = dt if dt is not None else 1.0 / self.sim_rate
+        self.sim_time += dt
 
-        # Calcul du temps écoulé
-        elapsed_time = time.time() - self.start_time
-        remaining_time = max(0, self.countdown_time - int(elapsed_time))
+        if self.dialog is not None:
+            self.dialog.update(dt)
 
-        # Vérifier le passage au niveau1
-        if self.current_map == "map.tmx" and self.player.feet.colliderect(self.enter_l1_rect):
-            self.switch_level()
-            return # Sortir après le changement de niveau
+        # Déplacement et animation de tous les pnj en une passe
+        self.follow_paths()
+        self.entities.wander(dt)
+        self.entities.step(dt)
+        self.animations.advance(self.entities, dt)
 
-        # Vérifier le passage à la map (depuis level1.tmx)
-        # Assurez-vous que 'exit_level' est le nom de l'objet dans level1.tmx qui ramène à la carte principale
-        # et que 'enter_l1_rect' est réaffecté correctement dans switch_level
-        if self.current_map == "level1.tmx" and self.player.feet.colliderect(self.enter_l1_rect):
-            self.level_completed = True # Le joueur a atteint l'objectif
-            return # Sortir pour afficher "Niveau Terminé"
+        self.group.update()
 
+        # Entrées et sorties du joueur dans les volumes (portail, objectif...) :
+        # un changement de carte ou la fin du niveau terminent le pas
+        if self.triggers.update(self.player.id, self.player.feet):
+            return
 
-        # Vérification du temps écoulé
-        if remaining_time <= 0 and self.current_map == "level1.tmx" and not self.level_completed:
+        # Vérification du temps écoulé, sur les cartes avec compte à rebours
+        if self.countdown_time is not None and self.remaining_time() <= 0:
             self.game_over = True
 
+        self.resolve_collisions()
+
+    def follow_paths(self):
+        """Oriente les pnj qui suivent un chemin, dès que celui-ci est calculé"""
+        for npc in self.npcs.values():
+            request = npc.path_request
+            if request is not None and (request.done() or self.deterministic):
+                npc.path_request = None
+                npc.follow(request.result())
+            if npc.path is not None:
+                npc.steer()
+
+    def remaining_time(self):
+        """Secondes restantes avant la fin du compte à rebours"""
+        elapsed_time = self.sim_time - self.start_time
+        return max(0, self.countdown_time - int(elapsed_time))
+
+    def resolve_collisions(self):
         # Verification de la collision
+        with self.profiler.section("collision"):
+            # Le déplacement du pas est balayé contre les murs : le joueur glisse
+            # le long des murs au lieu d'être ramené à sa position précédente
+            if self.player.resolve_movement(self.colliders):
+                self.collision_count += 1
+
+            # Phase large vectorisée : seuls les pnj proches d'un mur sont balayés précisément
+            # Grille redemandée à chaque pas : refaite par le niveau après add_wall/remove_wall
+            store = self.entities
+            wall_grid = self.level.collision_grid(self.grid_mode)
+            if wall_grid is not None:
+                grid, cell_size = wall_grid
+                candidates = store.broad_phase(cell_size, grid)
+            else:
+                candidates = store.active_ids()
+            for i in candidates:
+                npc = self.npcs.get(int(i))
+                if npc is not None and npc.resolve_movement(self.colliders):
+                    store.wander_timer[i] = 0  # Changer de direction au prochain pas
+
+    def draw(self, alpha=1.0):
+        """Affiche le jeu, les sprites étant interpolés entre deux pas de simulation"""
         for sprite in self.group.sprites():
-            if sprite.feet.collidelist(self.walls) > -1:
-                sprite.move_back()
+            sprite.interpolate(alpha)
+        # Caméra placée avant le dessin : la vue suit le joueur sans image de retard
+        with self.profiler.section("center"):
+            self.group.center(self.player.rect)
+        with self.profiler.section("draw"):
+            self.group.draw(self.screen)
+
+        # Afficher le compte à rebours uniquement sur les cartes qui en ont un
+        if self.countdown_time is not None:
+            self.hud_timer.draw(self.screen, self.remaining_time())
+
+        if self.dialog is not None:
+            self.dialog.draw(self.screen)
+
+        self.profiler.count(sprites=self.group.drawn, culled=self.group.culled, walls=len(self.walls))
+        self.profiler.draw_overlay(self.screen)
+
+    def show_end_screen(self, text, color):
+        """Écran de fin de partie, affiché jusqu'à Échap ou la fermeture de la fenêtre.
+
+        Comme les menus, il attend les événements avec pygame.event.wait :
+        rien n'est redessiné ni calculé tant que le joueur ne fait rien.
+        """
+        self.screen.fill((0, 0, 0)) # Fond noir
+        self.draw_text(text, color, self.screen_width // 2, self.screen_height // 2)
+        pygame.display.flip()
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return
 
     def run(self):
         if not self.show_main_menu():
             self.save_settings() # Sauvegarder les paramètres avant de quitter
+            self.close_music()
             pygame.quit()
             return
 
         clock = pygame.time.Clock()
         running = True
+        self.pending_interacts = 0  # Appuis sur « interact » pas encore traités
         self.play_background_music()
+        if self.save_path:
+            self.autosaver = savegame.Autosaver(self.save_path)
+
+        # Boucle à pas fixe : la simulation avance par tranches de sim_dt,
+        # l'affichage interpole entre les deux derniers états
+        sim_dt = 1.0 / self.sim_rate
+        accumulator = 0.0
+        previous_time = time.perf_counter()
 
         while running:
+            self.profiler.begin_frame()
+            # Les événements mettent à jour les touches tenues et déclenchent les actions
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        if not self.show_pause_menu():
-                            running = False
+                action = self.controls.handle_event(event)
+                if action == "overlay":
+                    self.profiler.toggle_overlay()
+                elif action == "interact":
+                    # Fait au début du prochain pas, pour être enregistré avec lui
+                    self.pending_interacts += 1
+                elif action == "pause":
+                    if not self.show_pause_menu():
+                        running = False
+                    # Ne pas rattraper le temps passé dans le menu pause
+                    previous_time = time.perf_counter()
+                    self.controls.reset()  # Touches relâchées pendant le menu
 
             if running and not self.game_over and not self.level_completed:
-                self.player.save_location()
-                self.handle_input()
-                self.update()
-                self.group.draw(self.screen)
-                self.group.center(self.player.rect)
-
-                # Afficher le compte à rebours uniquement sur level1.tmx
-                if self.current_map == "level1.tmx":
-                    elapsed_time = time.time() - self.start_time
-                    remaining_time = max(0, self.countdown_time - int(elapsed_time))
-                    self.draw_text(f"Temps: {remaining_time}", (255, 255, 255), self.screen_width - 100, 30)
-
-                pygame.display.flip()
-                clock.tick(60)
+                now = time.perf_counter()
+                accumulator += now - previous_time
+                previous_time = now
+
+                steps = 0
+                while accumulator >= sim_dt and steps < self.max_sim_steps:
+                    self.player.save_location()
+                    with self.profiler.section("input"):
+                        interact = self.pending_interacts > 0
+                        if interact:
+                            self.pending_interacts -= 1
+                            self.interact()
+                        # Le joueur ne bouge pas pendant un dialogue (l'enregistrement aussi)
+                        pressed = self.controls if self.dialog is None else KeyState()
+                        if self.recorder is not None:
+                            self.recorder.record(pressed, interact)
+                        self.handle_input(sim_dt, pressed)
+                    with self.profiler.section("update"):
+                        self.update(sim_dt)
+                    accumulator -= sim_dt
+                    steps += 1
+
+                # Trop en retard : on abandonne le temps restant plutôt que
+                # d'enchaîner les pas de simulation sans jamais afficher
+                if steps == self.max_sim_steps:
+                    accumulator = 0.0
+
+                if self.autosaver is not None:
+                    self.autosaver.update(self)
+
+                self.draw(accumulator / sim_dt)
+                with self.profiler.section("flip"):
+                    pygame.display.flip()
+                clock.tick(self.render_rate)
             elif self.game_over:
-                self.screen.fill((0, 0, 0)) # Fond noir
-                self.draw_text("GAME OVER", (255, 0, 0), self.screen_width // 2, self.screen_height // 2)
-                pygame.display.flip()
-                for event in pygame.event.get(): # Permettre de quitter le jeu
-                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
-                        running = False
+                self.show_end_screen("GAME OVER", (255, 0, 0))
+                running = False
             elif self.level_completed:
-                self.screen.fill((0, 0, 0)) # Fond noir
-                self.draw_text("Niveau 1 Terminé !", (0, 255, 0), self.screen_width // 2, self.screen_height // 2)
-                pygame.display.flip()
-                for event in pygame.event.get(): # Permettre de quitter le jeu
-                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
-                        running = False
+                self.show_end_screen(self.level.complete_text, (0, 255, 0))
+                running = False
             else: # Si le jeu n'est pas en cours (par exemple, après avoir quitté un menu)
                 running = False
 
 
         self.save_settings() # Sauvegarder les paramètres avant de quitter
-        if self.background_music:
-            self.background_music.stop()
+        if self.autosaver is not None:
+            # Partie en cours sauvegardée ; une partie finie garde la dernière sauvegarde
+            if not self.game_over and not self.level_completed:
+                self.autosaver.save(self)
+            self.autosaver.shutdown()
+        self.profiler.close()
+        self.navigation.shutdown()
+        if self.recorder is not None:
+            self.recorder.save(self)
+        self.assets.shutdown()
+        self.close_music()
 
         pygame.quit()
 
@@ -0,0 +1,156 @@
+"""Simulation sans fenêtre et mesure des temps de frame.
+
+Exemple :
+    python headless.py --map level1.tmx --frames 600 --script right:60,down:120
+    python headless.py --replay route.rpl
+"""
+import argparse
+import sys
+from collections import deque
+
+import pygame
+
+from controls import MOVES
+from game import Game
+import replay
+
+
+PHASES = ("input", "update", "collision", "draw", "flip")
+
+
+class ScriptedKeys:
+    """Remplace les commandes du joueur par un ensemble d'actions (« up », « left »...)"""
+
+    def __init__(self, actions=()):
+        self.actions = set(actions)
+
+    def __getitem__(self, action):
+        return action in self.actions
+
+
+def parse_script(text):
+    """Convertit « right:60,down+left:30,idle:10 » en [(touches, frames), ...]"""
+    script = []
+    for step in text.split(","):
+        name, frames = step.split(":")
+        keys = [key for key in name.split("+") if key != "idle"]
+        for key in keys:
+            if key not in MOVES:
+                raise ValueError(f"action inconnue dans le script : {key}")
+        script.append((keys, int(frames)))
+    return script
+
+
+def script_frames(script, frames):
+    """Renvoie l'état du clavier à chaque frame, en rejouant le script en boucle"""
+    states = []
+    while len(states) < frames:
+        for keys, count in script:
+            states.extend([ScriptedKeys(keys)] * count)
+    return states[:frames]
+
+
+def percentile(values, p):
+    """Percentile par rang le plus proche"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def run_headless(map_name="map.tmx", script=None, frames=600, collision_mode="objets",
+                 replay_path=None, record_path=None, seed=0):
+    """Joue ``frames`` pas de simulation sans fenêtre et renvoie les temps par phase.
+
+    Avec ``replay_path``, les paramètres et les touches viennent d'un
+    enregistrement ; avec ``record_path``, les touches jouées sont enregistrées.
+    """
+    if replay_path is not None:
+        header, inputs = replay.load(replay_path)
+        map_name, collision_mode, seed = header["start_map"], header["collision_mode"], header["seed"]
+        states = [replay.KeyState(bits) for bits in inputs]
+    else:
+        states = script_frames(script or [([], 1)], frames)
+    game = Game(collision_mode=collision_mode, headless=True, start_map=map_name, seed=seed,
+                record_path=record_path, deterministic=replay_path is not None)
+    dt = 1.0 / game.sim_rate
+
+    # Les phases sont mesurées par le profileur du jeu, sans limite d'historique
+    profiler = game.profiler
+    profiler.enabled = True
+    profiler.frames = deque()
+
+    for pressed in states:
+        if game.game_over or game.level_completed:
+            break
+        profiler.begin_frame()
+        game.player.save_location()
+        with profiler.section("input"):
+            if game.recorder is not None:
+                game.recorder.record(pressed)
+            game.handle_input(dt, pressed)
+        with profiler.section("update"):
+            game.update(dt)
+        game.draw()
+        with profiler.section("flip"):
+            pygame.display.flip()
+    if profiler.current:
+        profiler.end_frame()
+    if game.recorder is not None:
+        game.recorder.save(game)
+
+    timings = {phase: [] for phase in PHASES}
+    timings["frame"] = []
+    for record in profiler.frames:
+        collision = record.get("collision", 0.0)
+        timings["input"].append(record.get("input", 0.0))
+        timings["update"].append(record.get("update", 0.0) - collision)
+        timings["collision"].append(collision)
+        timings["draw"].append(record.get("draw", 0.0) + record.get("center", 0.0))
+        timings["flip"].append(record.get("flip", 0.0))
+        timings["frame"].append(record["time"])
+
+    return game, timings
+
+
+def report(timings):
+    """Affiche moyenne et percentiles de chaque phase (en millisecondes)"""
+    print(f"{'phase':<10} {'moy':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for phase in PHASES + ("frame",):
+        values = [t * 1000 for t in timings[phase]]
+        mean = sum(values) / len(values) if values else 0.0
+        print(f"{phase:<10} {mean:8.3f} {percentile(values, 50):8.3f} "
+              f"{percentile(values, 95):8.3f} {percentile(values, 99):8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--map", default="map.tmx", help="carte de départ")
+    parser.add_argument("--frames", type=int, default=600, help="nombre de frames simulées")
+    parser.add_argument("--script", default="right:60,down:60,left:60,up:60",
+                        help="séquence touches:frames, séparées par des virgules")
+    parser.add_argument("--collisions", default="objets", choices=("objets", "tuiles"))
+    parser.add_argument("--replay", metavar="FICHIER", help="rejoue un enregistrement au lieu du script")
+    parser.add_argument("--record", metavar="FICHIER", help="enregistre les touches jouées")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="échoue si le p95 du temps de frame dépasse ce budget")
+    args = parser.parse_args(argv)
+
+    game, timings = run_headless(args.map, parse_script(args.script), args.frames, args.collisions,
+                                 replay_path=args.replay, record_path=args.record)
+    print(f"{len(timings['frame'])} frames sur {game.current_map}, "
+          f"joueur en {[round(v, 2) for v in game.player.position]}")
+    report(timings)
+    pygame.quit()
+
+    if args.budget_ms is not None:
+        p95 = percentile(timings["frame"], 95) * 1000
+        if p95 > args.budget_ms:
+            print(f"p95 {p95:.3f} ms > budget {args.budget_ms:.3f} ms")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""Cache binaire des niveaux compilés.
+
+« python levelcache.py » compile chaque .tmx du dossier en un fichier .lvl :
+un en-tête JSON (dimensions, calques, objets, dépendances) suivi de blocs
+binaires alignés — gid des calques (uint32), carte des murs (un octet par
+tuile) et atlas RGBA de toutes les tuiles utilisées. Le fichier est lu par
+mmap, sans copie des calques. Quand la date de modification d'une source
+(tmx, tsx, images) change, son contenu est comparé : s'il a changé, le
+.lvl est ignoré (le tmx est lu) jusqu'à la prochaine compilation, sinon
+seules les dates de l'en-tête sont mises à jour.
+"""
+import glob
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from xml.etree import ElementTree
+
+import pygame
+import pytmx
+import pyscroll
+
+MAGIC = b"AVLV"
+VERSION = 1
+PREFIX = struct.Struct("<4sHI")  # magic, version, taille de l'en-tête JSON
+
+
+def cache_path(tmx_path):
+    """Chemin du fichier compilé associé à un tmx"""
+    return os.path.splitext(tmx_path)[0] + ".lvl"
+
+
+def dependencies(tmx_path):
+    """Fichiers sources d'un niveau : le tmx, ses tsx et les images des tuiles"""
+    deps = [os.path.normpath(tmx_path)]
+    directory = os.path.dirname(tmx_path)
+    root = ElementTree.parse(tmx_path).getroot()
+    for tileset in root.findall("tileset"):
+        base = directory
+        source = tileset.get("source")
+        if source is not None:
+            path = os.path.join(directory, source)
+            deps.append(os.path.normpath(path))
+            tileset = ElementTree.parse(path).getroot()
+            base = os.path.dirname(path)
+        for image in tileset.iter("image"):
+            deps.append(os.path.normpath(os.path.join(base, image.get("source"))))
+    return deps
+
+
+def sources_hash(deps):
+    digest = hashlib.sha1()
+    for path in deps:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _align(f, size=8):
+    f.write(b"\0" * (-f.tell() % size))
+
+
+def compile_level(tmx_path, out_path=None):
+    """Compile un tmx (carte finie) en fichier .lvl et renvoie son chemin"""
+    out_path = out_path or cache_path(tmx_path)
+
+    # pytmx convertit les tuiles : il lui faut un affichage (caché ici)
+    if pygame.display.get_surface() is None:
+        pygame.display.init()
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+
+    tmx = pytmx.util_pygame.load_pygame(tmx_path)
+    if any(props.get("frames") for props in tmx.tile_properties.values()):
+        raise ValueError(f"{tmx_path} : les tuiles animées ne sont pas compilées")
+
+    # Tuiles réellement utilisées, numérotées à partir de 1 dans l'atlas
+    atlas_ids = {}
+    layers = []
+    walls = None
+    for index, layer in enumerate(tmx.layers):
+        if not isinstance(layer, pytmx.TiledTileLayer):
+            continue
+        gids = array("I", bytes(4 * tmx.width * tmx.height))
+        for y, row in enumerate(layer.data):
+            for x, gid in enumerate(row):
+                if gid and tmx.images[gid] is not None:
+                    gids[y * tmx.width + x] = atlas_ids.setdefault(gid, len(atlas_ids) + 1)
+        layers.append({"index": index, "name": layer.name, "visible": bool(layer.visible), "gids": gids})
+
+        # Carte des murs, une case par tuile : tout gid non nul est un mur, même
+        # sans image (comme TileCollisionMap.from_layer)
+        if layer.name == "walls":
+            walls = bytes(1 if gid else 0 for row in layer.data for gid in row)
+
+    # Atlas : une grille de cases de la taille de la plus grande tuile
+    images = [tmx.images[gid] for gid in atlas_ids]
+    cell_w = max((image.get_width() for image in images), default=tmx.tilewidth)
+    cell_h = max((image.get_height() for image in images), default=tmx.tileheight)
+    columns = max(1, math.ceil(math.sqrt(len(images))))
+    rows = max(1, math.ceil(len(images) / columns))
+    atlas = pygame.Surface((columns * cell_w, rows * cell_h), pygame.SRCALPHA)
+    rects = []
+    for i, image in enumerate(images):
+        x, y = (i % columns) * cell_w, (i // columns) * cell_h
+        atlas.blit(image, (x, y))
+        rects.append([x, y, image.get_width(), image.get_height()])
+
+    deps = dependencies(tmx_path)
+    objects = [{
+        "name": obj.name, "type": obj.type, "x": obj.x, "y": obj.y,
+        "width": obj.width, "height": obj.height, "properties": obj.properties,
+    } for obj in tmx.objects]
+
+    blocks = [layer.pop("gids").tobytes() for layer in layers]
+    if sys.byteorder != "little":
+        blocks = [_swap(block) for block in blocks]
+    blocks.append(walls or b"")
+    blocks.append(pygame.image.tobytes(atlas, "RGBA"))
+
+    meta = {
+        "width": tmx.width, "height": tmx.height,
+        "tilewidth": tmx.tilewidth, "tileheight": tmx.tileheight,
+        "properties": tmx.properties, "objects": objects, "layers": layers,
+        "tiles": rects, "atlas_size": atlas.get_size(), "has_walls": walls is not None,
+        "deps": {path: os.path.getmtime(path) for path in deps}, "hash": sources_hash(deps),
+    }
+    return _write(out_path, meta, blocks)
+
+
+def _write(out_path, meta, blocks):
+    """Écrit un .lvl : l'en-tête ``meta`` puis les blocs alignés, et renvoie son chemin"""
+    # Les offsets des blocs dépendent de la taille de l'en-tête qui les contient :
+    # on recalcule jusqu'à ce qu'ils ne bougent plus
+    offsets = [0] * len(blocks)
+    while True:
+        meta["blocks"] = [[offset, len(block)] for offset, block in zip(offsets, blocks)]
+        header = json.dumps(meta, default=str).encode("utf-8")
+        position = PREFIX.size + len(header)
+        new_offsets = []
+        for block in blocks:
+            position += -position % 8
+            new_offsets.append(position)
+            position += len(block)
+        if new_offsets == offsets:
+            break
+        offsets = new_offsets
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for block in blocks:
+            _align(f)
+            f.write(block)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _swap(block):
+    values = array("I", block)
+    values.byteswap()
+    return values.tobytes()
+
+
+def read_header(path):
+    """Lit l'en-tête JSON d'un fichier .lvl (sans charger les données)"""
+    with open(path, "rb") as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size:
+            raise ValueError(f"{path} : niveau compilé tronqué")
+        magic, version, size = PREFIX.unpack(prefix)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} : format de niveau compilé inconnu")
+        return json.loads(f.read(size))
+
+
+def refresh_dates(path, header):
+    """Réécrit un .lvl avec les dates actuelles de ses sources (contenu inchangé)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    blocks = [data[offset:offset + length] for offset, length in header["blocks"]]
+    header["deps"] = {dep: os.path.getmtime(dep) for dep in header["deps"]}
+    return _write(path, header, blocks)
+
+
+def find_compiled(tmx_path):
+    """Renvoie le .lvl d'un tmx s'il existe et qu'il est à jour, sinon None.
+
+    Appelée depuis les threads de préchargement : un .lvl périmé n'est pas
+    recompilé ici (pytmx et l'affichage SDL ne s'utilisent que depuis le
+    thread principal), le niveau est lu depuis le tmx jusqu'au prochain
+    « python levelcache.py ».
+    """
+    path = cache_path(tmx_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        header = read_header(path)
+        deps = header["deps"]
+        if all(os.path.getmtime(dep) == mtime for dep, mtime in deps.items()):
+            return path
+        # Dates modifiées : le contenu l'est-il vraiment ? Sinon, nouvelles dates
+        # notées pour ne pas relire toutes les sources au prochain lancement
+        if sources_hash(list(deps)) == header["hash"] and list(deps) == dependencies(tmx_path):
+            try:
+                refresh_dates(path, header)
+            except OSError as e:
+                print(f"Erreur mise à jour {path}: {e}")
+            return path
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Niveau compilé illisible: {e}")
+        return None
+    print(f"Niveau compilé périmé {path} : lecture du tmx (python levelcache.py pour le refaire)")
+    return None
+
+
+class CompiledObject:
+    """Objet de carte relu depuis un niveau compilé (attributs de pytmx)"""
+
+    def __init__(self, data):
+        self.__dict__.update(data)
+
+
+class CompiledMap:
+    """Niveau compilé ouvert en mmap"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        _, _, size = PREFIX.unpack(view[:PREFIX.size])
+        header = json.loads(bytes(view[PREFIX.size:PREFIX.size + size]))
+
+        self.width = header["width"]
+        self.height = header["height"]
+        self.tilewidth = header["tilewidth"]
+        self.tileheight = header["tileheight"]
+        self.properties = header["properties"]
+        self.objects = [CompiledObject(obj) for obj in header["objects"]]
+
+        blocks = [view[offset:offset + length] for offset, length in header["blocks"]]
+        self.layers = {}
+        self.layer_names = {}
+        self.visible_tile_layers = []
+        for layer, block in zip(header["layers"], blocks):
+            gids = block.cast("I") if sys.byteorder == "little" else array("I", _swap(block))
+            self.layers[layer["index"]] = gids
+            self.layer_names[layer["name"]] = layer["index"]
+            if layer["visible"]:
+                self.visible_tile_layers.append(layer["index"])
+        self.walls = bytes(blocks[-2]) if header["has_walls"] else None
+
+        # Une seule surface pour toutes les tuiles, découpée en sous-surfaces
+        atlas = pygame.image.frombuffer(blocks[-1], tuple(header["atlas_size"]), "RGBA")
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        else:
+            atlas = atlas.copy()
+        self.atlas = atlas
+        self.images = [None] + [atlas.subsurface(rect) for rect in header["tiles"]]
+
+
+class CompiledMapData(pyscroll.data.PyscrollDataAdapter):
+    """Source de données pyscroll lisant un niveau compilé"""
+
+    def __init__(self, compiled_map):
+        super().__init__()
+        self.map = compiled_map
+        self.reload_animations()
+
+    @property
+    def tile_size(self):
+        return self.map.tilewidth, self.map.tileheight
+
+    @property
+    def map_size(self):
+        return self.map.width, self.map.height
+
+    @property
+    def visible_tile_layers(self):
+        return self.map.visible_tile_layers
+
+    def reload_data(self):
+        self.map = CompiledMap(self.map.path)
+
+    def get_animations(self):
+        return ()
+
+    def convert_surfaces(self, parent, alpha=False):
+        pass
+
+    def _get_tile_image(self, x, y, l):
+        if x < 0 or y < 0 or x >= self.map.width or y >= self.map.height:
+            return None
+        return self.map.images[self.map.layers[l][y * self.map.width + x]]
+
+    def get_tile_images_by_rect(self, rect):
+        x1, y1, x2, y2 = pyscroll.common.rect_to_bb(rect)
+        width = self.map.width
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, width - 1), min(y2, self.map.height - 1)
+        images = self.map.images
+        for l in self.visible_tile_layers:
+            gids = self.map.layers[l]
+            for y in range(y1, y2 + 1):
+                row = y * width
+                for x in range(x1, x2 + 1):
+                    gid = gids[row + x]
+                    if gid:
+                        yield x, y, l, images[gid]
+
+
+def compile_all(directory="."):
+    """Compile tous les tmx finis d'un dossier, renvoie les fichiers écrits"""
+    written = []
+    for tmx_path in sorted(glob.glob(os.path.join(directory, "*.tmx"))):
+        root = ElementTree.parse(tmx_path).getroot()
+        if root.get("infinite") == "1":
+            continue
+        try:
+            written.append(compile_level(tmx_path))
+        except ValueError as e:
+            print(e)
+    return written
+
+
+if __name__ == '__main__':
+    for path in compile_all(sys.argv[1] if len(sys.argv) > 1 else "."):
+        print(f"{path} : {os.path.getsize(path)} octets")
@@ -0,0 +1,294 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pygame
+import pytmx
+import pyscroll
+
+from chunks import ChunkedCollisionMap, ChunkedMap, ChunkedMapData, is_infinite
+from collisions import SpatialHash, TileCollisionMap
+from entities import occupancy_grid
+from levelcache import CompiledMap, CompiledMapData, find_compiled
+from render import ScaledMapData
+from triggers import Trigger
+
+# Objets avec lesquels le joueur peut interagir, et portée de l'interaction (pixels)
+INTERACTIVE = ("coffre", "panneau")
+REACH = 12
+
+
+class Portal:
+    """Passage vers une autre carte (objet tmx de type « portal »)"""
+
+    def __init__(self, name, rect, target_map, target_spawn):
+        self.name = name
+        self.rect = rect
+        self.target_map = target_map
+        self.target_spawn = target_spawn
+
+
+class Level:
+    """Données d'un niveau, analysées une seule fois à partir du fichier tmx"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        # charger la carte (tmx)
+        self.tmx_data = pytmx.util_pygame.load_pygame(filename)
+        self.map_data = pyscroll.data.TiledMapData(self.tmx_data)
+
+        self.setup(self.tmx_data.objects, self.tmx_data.properties)
+
+        # Carte de collision par tuile, à partir du calque « walls » s'il existe
+        try:
+            self.wall_bitmap = TileCollisionMap.from_layer(self.tmx_data, "walls")
+        except ValueError:
+            self.wall_bitmap = None
+        self.mark_obstacles()
+
+    def setup(self, objects, properties):
+        """Prépare collisions, portails et objets nommés à partir des objets de la carte"""
+        objects = list(objects)
+
+        # Definir la liste de rectangle de collision (les coffres sont aussi des obstacles)
+        self.walls = []
+        self.obstacles = []
+        for obj in objects:
+            if obj.type in ("collision", "coffre"):
+                self.walls.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
+            if obj.type == "coffre":
+                self.obstacles.append(self.walls[-1])
+
+        # Portails vers les autres cartes et objectifs de fin de niveau
+        self.portals = []
+        self.goals = []
+        for obj in objects:
+            if obj.type == "portal":
+                self.portals.append(Portal(obj.name, pygame.Rect(obj.x, obj.y, obj.width, obj.height),
+                                           obj.properties["target_map"], obj.properties["target_spawn"]))
+            elif obj.type == "goal":
+                self.goals.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
+
+        # Volumes déclencheurs : portails, objectifs, et abords des objets interactifs
+        self.triggers = [Trigger(portal.name, "portal", portal.rect, portal) for portal in self.portals]
+        self.triggers += [Trigger(None, "goal", goal) for goal in self.goals]
+        for obj in objects:
+            if obj.type in INTERACTIVE:
+                rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height).inflate(2 * REACH, 2 * REACH)
+                self.triggers.append(Trigger(obj.name, obj.type, rect, obj))
+
+        # Index spatial des murs et des volumes déclencheurs, construit une seule fois par niveau
+        self.index = SpatialHash.from_rects(self.walls)
+        for trigger in self.triggers:
+            self.index.add(trigger.rect, "trigger", trigger)
+
+        # Propriétés de la carte : point d'apparition, compte à rebours (secondes),
+        # texte affiché quand l'objectif est atteint
+        self.spawn = properties.get("spawn")
+        self.countdown = properties.get("countdown")
+        self.complete_text = properties.get("complete_text", "Niveau terminé !")
+
+        # Objets nommés (enter_l1, exit_level, spawn_player, spawn_map...)
+        self.objects = {}
+        for obj in objects:
+            if obj.name:
+                self.objects[obj.name] = obj
+
+        # Personnages non joueurs à faire apparaître
+        self.npcs = [obj for obj in objects if obj.type == "pnj"]
+
+        # Grilles de phase large des collisions, calculées à la demande
+        self._grids = {}
+        self.revision = 0  # Incrémenté à chaque modification des murs
+
+    def mark_obstacles(self):
+        """Les tuiles couvertes par un coffre sont aussi des murs de la collision par tuiles"""
+        bitmap = self.wall_bitmap
+        if bitmap is None:
+            return
+        tw, th = bitmap.tile_width, bitmap.tile_height
+        for rect in self.obstacles:
+            for ty in range(max(rect.top // th, 0), min((rect.bottom - 1) // th + 1, bitmap.height)):
+                for tx in range(max(rect.left // tw, 0), min((rect.right - 1) // tw + 1, bitmap.width)):
+                    bitmap.set_wall(tx, ty)
+
+    def add_wall(self, rect):
+        """Ajoute un mur pendant la partie"""
+        self.walls.append(rect)
+        self.index.add(rect)
+        self._grids.clear()
+        self.revision += 1
+
+    def remove_wall(self, rect):
+        """Retire un mur pendant la partie (ValueError si ``rect`` n'est pas un mur du niveau).
+
+        ``rect`` peut être un rectangle égal au mur : c'est le mur rangé dans
+        l'index qui est retiré de la liste et de l'index.
+        """
+        try:
+            wall = self.walls[self.walls.index(rect)]
+        except ValueError:
+            raise ValueError(f"{rect} n'est pas un mur de {self.filename}") from None
+        self.walls.remove(wall)
+        self.index.remove(wall)
+        self._grids.clear()
+        self.revision += 1
+
+    def collision_grid(self, mode):
+        """Grille booléenne des cases contenant un mur et taille de case en pixels.
+
+        Sert de phase large pour tester d'un coup toutes les entités ;
+        renvoie None si la source de collision ne s'y prête pas.
+        """
+        if mode not in self._grids:
+            grid = None
+            if mode == "tuiles" and isinstance(getattr(self.wall_bitmap, "cells", None), bytearray):
+                bitmap = self.wall_bitmap
+                cells = np.frombuffer(bytes(bitmap.cells), dtype=np.uint8)
+                grid = (cells.reshape(bitmap.height, bitmap.width) != 0, bitmap.tile_width)
+            elif mode == "objets":
+                grid = (occupancy_grid(self.index), self.index.cell_size)
+            self._grids[mode] = grid
+        return self._grids[mode]
+
+    def neighbours(self):
+        """Cartes accessibles depuis celle-ci par un portail"""
+        return [portal.target_map for portal in self.portals]
+
+    def get_position(self, name):
+        """Renvoie la position (x, y) d'un objet nommé"""
+        obj = self.objects[name]
+        return obj.x, obj.y
+
+
+class ChunkedLevel(Level):
+    """Niveau issu d'une carte infinie, dont les tuiles sont chargées par chunks"""
+
+    def __init__(self, filename, max_chunks=256):
+        self.filename = filename
+        self.tmx_data = ChunkedMap(filename, max_chunks)
+        self.map_data = ChunkedMapData(self.tmx_data)
+        self.setup(self.tmx_data.objects, self.tmx_data.properties)
+
+        try:
+            self.wall_bitmap = ChunkedCollisionMap(self.tmx_data, "walls")
+        except ValueError:
+            self.wall_bitmap = None
+        self.mark_obstacles()
+
+
+class CompiledLevel(Level):
+    """Niveau relu depuis son fichier compilé (.lvl), sans analyse du tmx"""
+
+    def __init__(self, filename, compiled_path):
+        self.filename = filename
+        self.tmx_data = CompiledMap(compiled_path)
+        self.map_data = CompiledMapData(self.tmx_data)
+        self.setup(self.tmx_data.objects, self.tmx_data.properties)
+
+        self.wall_bitmap = None
+        if self.tmx_data.walls is not None:
+            data = self.tmx_data
+            self.wall_bitmap = TileCollisionMap(data.width, data.height, data.tilewidth, data.tileheight)
+            self.wall_bitmap.cells[:] = data.walls
+        self.mark_obstacles()
+
+
+class LevelRegistry:
+    """Cache des niveaux chargés et des renderers associés.
+
+    Chaque fichier tmx n'est analysé qu'une fois. Les renderers restent
+    en mémoire (les moins récemment utilisés sont libérés au-delà de
+    ``max_renderers``) et un niveau voisin peut être préchargé dans un
+    thread pour rendre les transitions instantanées.
+    """
+
+    def __init__(self, screen_size, zoom=1.5, max_renderers=2, use_compiled=True, prescale=True):
+        self.screen_size = screen_size
+        self.zoom = zoom
+        self.prescale = prescale  # Zoom pré-calculé plutôt que redimensionnement à chaque frame
+        self.max_renderers = max_renderers
+        self.use_compiled = use_compiled
+
+        self._levels = {}
+        self._pending = {}
+        self._renderers = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def get(self, filename):
+        """Renvoie le niveau, en le chargeant si nécessaire"""
+        with self._lock:
+            level = self._levels.get(filename)
+            if level is not None:
+                return level
+            # Place réservée sous le verrou : un préchargement du même fichier
+            # lancé entre-temps attend ce chargement au lieu d'en refaire un
+            future = self._pending.get(filename)
+            loading = future is None
+            if loading:
+                future = self._pending[filename] = Future()
+
+        if loading:
+            self._run(future, filename)
+        # Sinon le niveau est en cours de chargement : on attend le résultat
+        return future.result()
+
+    def prefetch(self, filename):
+        """Précharge un niveau en arrière-plan"""
+        with self._lock:
+            if filename in self._levels or filename in self._pending:
+                return
+            future = self._pending[filename] = Future()
+        self._executor.submit(self._run, future, filename)
+
+    def get_renderer(self, filename):
+        """Renvoie le renderer du niveau, en le gardant « chaud »"""
+        renderer = self._renderers.get(filename)
+        if renderer is not None:
+            self._renderers.move_to_end(filename)
+            return renderer
+
+        level = self.get(filename)
+        if self.prescale and self.zoom != 1 and ScaledMapData.supports(level.map_data, self.zoom):
+            # Tuiles agrandies une fois pour toutes : rendu direct à la taille de l'écran
+            data = ScaledMapData(level.map_data, self.zoom)
+            if not isinstance(level, ChunkedLevel):
+                data.prepare()
+            renderer = pyscroll.orthographic.BufferedRenderer(data, self.screen_size)
+        else:
+            renderer = pyscroll.orthographic.BufferedRenderer(level.map_data, self.screen_size)
+            renderer.zoom = self.zoom
+        self._renderers[filename] = renderer
+
+        # Libérer les renderers les moins récemment utilisés
+        while len(self._renderers) > self.max_renderers:
+            self._renderers.popitem(last=False)
+
+        return renderer
+
+    def _run(self, future, filename):
+        """Charge le niveau dont ``future`` a réservé la place et y dépose le résultat"""
+        try:
+            level = self._load(filename)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(filename, None)
+            future.set_exception(e)
+        else:
+            future.set_result(level)
+
+    def _load(self, filename):
+        compiled = find_compiled(filename) if self.use_compiled else None
+        if compiled is not None:
+            level = CompiledLevel(filename, compiled)
+        elif is_infinite(filename):
+            level = ChunkedLevel(filename)
+        else:
+            level = Level(filename)
+        with self._lock:
+            self._levels[filename] = level
+            self._pending.pop(filename, None)
+        return level
@@ -1,9 +1,15 @@
+import argparse
+
 import pygame
 
 from game import Game
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Adventure-Game prototype")
+    parser.add_argument("--record", metavar="FICHIER", help="enregistre la partie (relecture : replay.py)")
+    parser.add_argument("--seed", type=int, default=None, help="graine du hasard (pnj)")
+    args = parser.parse_args()
+
     pygame.init()
-    game = Game()
+    game = Game(seed=args.seed, record_path=args.record)
     game.run()
-    
\ No newline at end of file
@@ -0,0 +1,104 @@
+import pygame
+
+WHITE = (255, 255, 255)
+YELLOW = (255, 255, 0)
+
+
+class Menu:
+    """Menu vertical piloté au clavier.
+
+    Le fond et le titre sont dessinés une seule fois ; ensuite seules les
+    lignes dont l'état change sont redessinées (display.update sur leurs
+    rectangles). La boucle attend les événements avec pygame.event.wait,
+    le menu ne consomme donc rien tant que le joueur ne touche à rien.
+    """
+
+    def __init__(self, game, title, options, title_y, top, spacing, draw_background,
+                 quit_value=False, escape_value=False):
+        self.game = game
+        self.title = title
+        self.options = list(options)
+        self.title_y = title_y
+        self.top = top
+        self.spacing = spacing
+        self.draw_background = draw_background
+        self.quit_value = quit_value
+        self.escape_value = escape_value
+        self.selected = 0
+        self.backdrop = None
+
+    def render_text(self, text, color):
+        """Rendu d'un texte, via le cache partagé du jeu"""
+        return self.game.text_cache.render(self.game.font, text, color)
+
+    def option_rect(self, index):
+        """Rectangle occupé par une option à l'écran"""
+        color = YELLOW if index == self.selected else WHITE
+        text = self.render_text(self.options[index], color)
+        return text.get_rect(midtop=(self.game.screen_width // 2, self.top + index * self.spacing))
+
+    def draw_option(self, index):
+        """Redessine une option sur le fond mémorisé et renvoie la zone modifiée"""
+        screen = self.game.screen
+        color = YELLOW if index == self.selected else WHITE
+        rect = self.option_rect(index)
+        screen.blit(self.backdrop, rect, rect)
+        screen.blit(self.render_text(self.options[index], color), rect)
+        return rect
+
+    def redraw(self):
+        """Redessine tout le menu (à l'ouverture ou après un changement d'écran)"""
+        screen = self.game.screen
+        self.draw_background(screen)
+        title = self.render_text(self.title, WHITE)
+        screen.blit(title, (self.game.screen_width // 2 - title.get_width() // 2, self.title_y))
+        self.backdrop = screen.copy()
+        for i in range(len(self.options)):
+            self.draw_option(i)
+        pygame.display.flip()
+
+    def select(self, index):
+        """Change la sélection en ne redessinant que les deux lignes concernées"""
+        old = self.selected
+        self.selected = index % len(self.options)
+        pygame.display.update([self.draw_option(old), self.draw_option(self.selected)])
+
+    def set_options(self, options):
+        """Remplace le texte des options et ne redessine que celles qui ont changé"""
+        dirty = []
+        for i, option in enumerate(options):
+            if option != self.options[i]:
+                old = self.option_rect(i)
+                self.game.screen.blit(self.backdrop, old, old)
+                self.options[i] = option
+                dirty.append(old)
+                dirty.append(self.draw_option(i))
+        if dirty:
+            pygame.display.update(dirty)
+
+    def run(self, on_select):
+        """Boucle du menu.
+
+        ``on_select(index)`` est appelé sur Entrée ; s'il renvoie autre chose
+        que None, le menu se ferme et renvoie cette valeur.
+        """
+        self.redraw()
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                return self.quit_value
+
+            if event.type != pygame.KEYDOWN:
+                continue
+            if event.key == pygame.K_DOWN:
+                self.select(self.selected + 1)
+            elif event.key == pygame.K_UP:
+                self.select(self.selected - 1)
+            elif event.key == pygame.K_ESCAPE:
+                return self.escape_value
+            elif event.key == pygame.K_RETURN:
+                result = on_select(self.selected)
+                if result is not None:
+                    return result
+                # Un sous-menu ou le plein écran a pu recouvrir l'écran
+                self.redraw()
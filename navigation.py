@@ -0,0 +1,183 @@
+"""Recherche de chemin (A*) pour les pnj.
+
+La grille de navigation d'un niveau est construite à partir de ses murs
+(calque walls et objets de collision). Les chemins calculés sont gardés
+en cache par (case de départ, case d'arrivée) jusqu'à ce que le niveau
+change. Les recherches sont faites par un thread de travail : la boucle
+principale dépose des demandes et relève les résultats quand ils sont prêts.
+"""
+import heapq
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class NavGrid:
+    """Grille des cases praticables d'un niveau (un octet par case, 1 = mur)"""
+
+    def __init__(self, width, height, cell_size, blocked):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.blocked = blocked
+
+    @classmethod
+    def from_level(cls, level, cell_size=None):
+        """Construit la grille d'un niveau à partir de ses murs"""
+        tile_w, tile_h = level.map_data.tile_size
+        map_w, map_h = level.map_data.map_size
+        size = cell_size or tile_w
+        width, height = map_w * tile_w // size, map_h * tile_h // size
+        blocked = bytearray(width * height)
+
+        # Objets de collision : toutes les cases qu'ils recouvrent
+        for rect in level.walls:
+            x0, y0 = max(rect.left // size, 0), max(rect.top // size, 0)
+            x1, y1 = min((rect.right - 1) // size, width - 1), min((rect.bottom - 1) // size, height - 1)
+            for y in range(y0, y1 + 1):
+                blocked[y * width + x0:y * width + x1 + 1] = b"\1" * (x1 - x0 + 1)
+
+        # Calque walls : les cases recouvertes par chaque tuile mur (lue chunk
+        # par chunk pour une carte infinie, sans tester toutes les cases du monde)
+        bitmap = level.wall_bitmap
+        if bitmap is not None:
+            tw, th = bitmap.tile_width, bitmap.tile_height
+            for tx, ty in bitmap.wall_tiles():
+                x0, y0 = tx * tw // size, ty * th // size
+                if x0 >= width or y0 >= height or tx < 0 or ty < 0:
+                    continue
+                x1, y1 = min(((tx + 1) * tw - 1) // size, width - 1), min(((ty + 1) * th - 1) // size, height - 1)
+                for y in range(y0, y1 + 1):
+                    blocked[y * width + x0:y * width + x1 + 1] = b"\1" * (x1 - x0 + 1)
+
+        return cls(width, height, size, blocked)
+
+    def inflated(self, radius_x, radius_y):
+        """Grille dont les murs sont épaissis de (radius_x, radius_y) cases.
+
+        Ses chemins laissent la place de passer à une boîte plus large
+        qu'une case centrée sur chaque étape.
+        """
+        width, height = self.width, self.height
+        blocked = bytearray(width * height)
+        for i, wall in enumerate(self.blocked):
+            if wall:
+                x, y = i % width, i // width
+                x0, x1 = max(x - radius_x, 0), min(x + radius_x, width - 1)
+                for yy in range(max(y - radius_y, 0), min(y + radius_y, height - 1) + 1):
+                    blocked[yy * width + x0:yy * width + x1 + 1] = b"\1" * (x1 - x0 + 1)
+        return NavGrid(width, height, self.cell_size, blocked)
+
+    def cell_at(self, point):
+        return int(point[0]) // self.cell_size, int(point[1]) // self.cell_size
+
+    def center(self, cell):
+        return cell[0] * self.cell_size + self.cell_size // 2, cell[1] * self.cell_size + self.cell_size // 2
+
+    def walkable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and not self.blocked[y * self.width + x]
+
+    def nearest_walkable(self, cell, radius=4):
+        """Case praticable la plus proche de ``cell`` (à ``radius`` cases au plus), ou None"""
+        x, y = cell
+        for r in range(radius + 1):
+            for dy in range(-r, r + 1):
+                for dx in range(-r, r + 1):
+                    if max(abs(dx), abs(dy)) == r and self.walkable(x + dx, y + dy):
+                        return x + dx, y + dy
+        return None
+
+    def find_path(self, start, goal):
+        """Cases du plus court chemin de ``start`` à ``goal`` (A*, 4 directions), ou None"""
+        if not self.walkable(*start) or not self.walkable(*goal):
+            return None
+
+        width, height, blocked = self.width, self.height, self.blocked
+        gx, gy = goal
+        origin = start[1] * width + start[0]
+        target = gy * width + gx
+        came_from = {origin: -1}
+        cost = {origin: 0}
+        heap = [(abs(start[0] - gx) + abs(start[1] - gy), 0, origin)]
+
+        while heap:
+            _, current_cost, current = heapq.heappop(heap)
+            if current == target:
+                path = []
+                while current != -1:
+                    path.append((current % width, current // width))
+                    current = came_from[current]
+                path.reverse()
+                return path
+            if current_cost > cost[current]:
+                continue  # Entrée périmée du tas
+
+            x, y = current % width, current // width
+            new_cost = current_cost + 1
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbour = ny * width + nx
+                    if not blocked[neighbour] and new_cost < cost.get(neighbour, new_cost + 1):
+                        cost[neighbour] = new_cost
+                        came_from[neighbour] = current
+                        heapq.heappush(heap, (new_cost + abs(nx - gx) + abs(ny - gy), new_cost, neighbour))
+        return None
+
+
+class PathService:
+    """Calcule les chemins du niveau courant dans un thread, avec cache"""
+
+    def __init__(self, max_workers=1, cache_size=1024):
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="paths")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.level = None
+        self.grid = None
+        self._revision = None
+
+    def set_level(self, level):
+        """Change de niveau : grille et cache seront refaits à la prochaine demande"""
+        with self._lock:
+            self.level = level
+            self.grid = None
+            self._cache.clear()
+
+    def _current_grid(self):
+        # Appelé sous le verrou ; un mur ajouté ou retiré invalide aussi la grille
+        if self.grid is None or self._revision != self.level.revision:
+            self.grid = NavGrid.from_level(self.level)
+            self._revision = self.level.revision
+            self._cache.clear()
+        return self.grid
+
+    def find_path(self, start, goal):
+        """Chemin en pixels (centres des cases) entre deux points, ou None"""
+        with self._lock:
+            grid = self._current_grid()
+            key = (grid.cell_at(start), grid.cell_at(goal))
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                cells = self._cache[key]
+                return None if cells is None else [grid.center(cell) for cell in cells]
+
+        cells = grid.find_path(*key)
+
+        with self._lock:
+            if self.grid is grid:
+                self._cache[key] = cells
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return None if cells is None else [grid.center(cell) for cell in cells]
+
+    def request(self, start, goal):
+        """Demande un chemin en arrière-plan, renvoie un Future"""
+        return self._executor.submit(self.find_path, start, goal)
+
+    def request_many(self, pairs):
+        """Demande un lot de chemins [(départ, arrivée), ...] en une seule tâche"""
+        pairs = list(pairs)
+        return self._executor.submit(lambda: [self.find_path(start, goal) for start, goal in pairs])
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,110 +1,70 @@
 import pygame
 
+from animation import DIRECTIONS, library
+from collisions import slide
+from entities import EntityPosition, EntityStore
+
 class Player(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+    def __init__(self, x, y, store=None):
         super().__init__()
-        # Chargement de la feuille de sprites
-        self.sprite_sheet = pygame.image.load('Player.png')
-        
-        # Paramètres d'animation
-        self.animation_frames = {
-            'down': [],
-            'left': [],
-            'right': [],
-            'up': []
-        }
-        self.animation_speed = 0.15  # Vitesse de l'animation
-        self.current_frame = 0
-        self.animation_timer = 0
+        # Animations décrites dans Player.anim (voir animation.py), avancées avec celles des pnj
+        self.animation = library().character('Player.png')
         self.current_direction = 'down'
-        
-        # Initialisation des animations
-        self.load_animations()
-        self.image = self.animation_frames['down'][0]
-        self.image.set_colorkey([0, 0, 0])
+        self.image = self.animation.image
         self.rect = self.image.get_rect()
-        self.position = [x, y]
-        
-        # Pour les collisions
+
+        # Pour les collisions : les pieds, à position fixe dans l'image
         self.feet = pygame.Rect(0, 0, self.rect.width * 0.5, 12)
+        self.feet.midbottom = self.rect.midbottom
+        self.feet_offset = (self.feet.x - self.rect.x, self.feet.y - self.rect.y)
+
+        # Le joueur est une entité comme les pnj : sa position vit dans le stockage
+        self.store = store if store is not None else EntityStore(capacity=1)
+        self.id = self.store.spawn(x, y, self.rect.size, self.feet.size)
+        self.animation.attach(self.store, self.id)
+        self.position = EntityPosition(self.store, self.id)
         self.old_position = self.position.copy()
-        self.speed = 3
+        self.speed = 180  # Pixels par seconde
         self.moving = False  # Pour savoir si le joueur est en mouvement
 
-    def load_animations(self):
-        """Charge toutes les frames d'animation pour chaque direction"""
-        # Chaque direction a 3 frames d'animation (0, 1, 2)
-        for i in range(3):
-            # Animation vers le bas
-            frame = self.get_image(i * 48, 0)
-            self.animation_frames['down'].append(frame)
-            
-            # Animation vers la gauche
-            frame = self.get_image(i * 48, 48)
-            self.animation_frames['left'].append(frame)
-            
-            # Animation vers la droite
-            frame = self.get_image(i * 48, 96)
-            self.animation_frames['right'].append(frame)
-            
-            # Animation vers le haut
-            frame = self.get_image(i * 48, 144)  # Note: 145 corrigé en 144 pour l'alignement
-            self.animation_frames['up'].append(frame)
-
     def animate(self, direction):
-        """Gère l'animation dans la direction donnée"""
+        """Oriente le joueur ; l'image suit au prochain pas d'animation (marche ou arrêt)"""
         self.current_direction = direction
-        self.animation_timer += self.animation_speed
-        
-        if self.moving:  # Animation seulement si le joueur bouge
-            if self.animation_timer >= 1:
-                self.current_frame = (self.current_frame + 1) % len(self.animation_frames[direction])
-                self.animation_timer = 0
-        else:
-            self.current_frame = 0  # Revenir à la frame de base quand immobile
-        
-        self.image = self.animation_frames[direction][self.current_frame]
-        self.image.set_colorkey([0, 0, 0])
+        self.store.direction[self.id] = DIRECTIONS.index(direction)
+        self.store.walking[self.id] = self.moving
 
     def save_location(self): 
         self.old_position = self.position.copy()
 
-    def move_right(self): 
-        self.position[0] += self.speed
-        self.moving = True
-        self.animate('right')
-
-    def move_left(self): 
-        self.position[0] -= self.speed
+    def move(self, dx, dy, dt):
+        """Déplace le joueur selon le vecteur (dx, dy), diagonales comprises (voir controls.direction)"""
+        self.position[0] += self.speed * dx * dt
+        self.position[1] += self.speed * dy * dt
         self.moving = True
-        self.animate('left')
-
-    def move_up(self): 
-        self.position[1] -= self.speed
-        self.moving = True
-        self.animate('up')
-
-    def move_down(self): 
-        self.position[1] += self.speed
-        self.moving = True
-        self.animate('down')
+        # Quatre directions d'animation : en diagonale, on garde la direction en cours si elle convient
+        horizontal = 'right' if dx > 0 else 'left'
+        vertical = 'down' if dy > 0 else 'up'
+        if dx and dy and self.current_direction in (horizontal, vertical):
+            direction = self.current_direction
+        else:
+            direction = horizontal if dx else vertical
+        self.animate(direction)
 
     def stop_moving(self):
-        """Arrête l'animation et reste sur la première frame"""
+        """Arrête l'animation : clip d'arrêt dans la direction en cours"""
         self.moving = False
         self.animate(self.current_direction)
 
     def update(self):
         self.rect.topleft = self.position
         self.feet.midbottom = self.rect.midbottom
+        self.image = self.animation.library.atlas.images[self.store.image[self.id]]
 
-    def move_back(self):
-        self.position = self.old_position
-        self.rect.topleft = self.position
-        self.feet.midbottom = self.rect.midbottom
+    def interpolate(self, alpha):
+        """Place l'image entre la position précédente et l'actuelle (0 <= alpha <= 1)"""
+        x = self.old_position[0] + (self.position[0] - self.old_position[0]) * alpha
+        y = self.old_position[1] + (self.position[1] - self.old_position[1]) * alpha
+        self.rect.topleft = (round(x), round(y))
 
-    def get_image(self, x, y):
-        """Extrait une image de la feuille de sprites"""
-        image = pygame.Surface([40, 48], pygame.SRCALPHA)
-        image.blit(self.sprite_sheet, (0, 0), (x, y, 40, 48))
-        return image
\ No newline at end of file
+    def resolve_movement(self, colliders):
+        return slide(self, self.old_position, self.feet_offset, colliders)
@@ -0,0 +1,136 @@
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import pygame
+
+# Contexte vide renvoyé quand le profilage est désactivé (aucune mesure)
+_NULL_SECTION = nullcontext()
+
+
+class _Section:
+    """Chronomètre d'une section nommée, réutilisé à chaque frame"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class Profiler:
+    """Mesure du temps passé dans chaque phase de la boucle de jeu.
+
+    Les sections sont des context managers : ``with profiler.section("update"):``.
+    Désactivé, le profileur renvoie un contexte vide et ne mesure rien.
+    Les frames peuvent être exportées au format JSON lines pour analyse.
+    """
+
+    def __init__(self, enabled=False, history=120, export_path=None):
+        self.enabled = enabled or export_path is not None
+        self.overlay = False
+        self.frames = deque(maxlen=history)
+        self.current = {}
+        self.counters = {}
+        self.frame_count = 0
+        self._sections = {}
+        self._frame_start = None
+        self._export = open(export_path, "w") if export_path else None
+        self._font = None
+
+    def section(self, name):
+        """Renvoie le chronomètre de la section ``name``"""
+        if not self.enabled:
+            return _NULL_SECTION
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = _Section(self, name)
+        return section
+
+    def toggle_overlay(self):
+        """Affiche ou masque l'overlay (et active le profilage avec lui)"""
+        self.overlay = not self.overlay
+        self.enabled = self.overlay or self._export is not None
+        self._frame_start = None
+
+    def begin_frame(self):
+        """Début d'une frame : la durée est mesurée d'un début de frame au suivant"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.end_frame(now)
+        self._frame_start = now
+
+    def end_frame(self, now=None):
+        """Fin de frame : enregistre les mesures et les exporte"""
+        if now is None:
+            now = time.perf_counter()
+        record = {"frame": self.frame_count, "time": now - self._frame_start}
+        record.update(self.current)
+        record.update(self.counters)
+        self.frames.append(record)
+        if self._export is not None:
+            self._export.write(json.dumps(record) + "\n")
+        self.frame_count += 1
+        self.current = {}
+        self.counters = {}
+
+    def count(self, **counters):
+        """Enregistre des compteurs pour la frame en cours (sprites, murs...)"""
+        if self.enabled:
+            self.counters = counters
+
+    def fps(self):
+        """Images par seconde moyennes sur l'historique"""
+        if not self.frames:
+            return 0.0
+        total = sum(frame["time"] for frame in self.frames)
+        return len(self.frames) / total if total else 0.0
+
+    def draw_overlay(self, surface):
+        """Dessine FPS, compteurs et graphe des temps de frame"""
+        if not self.overlay:
+            return
+        if self._font is None:
+            self._font = pygame.font.Font(None, 20)
+
+        width, height = 240, 110
+        panel = pygame.Rect(10, 10, width, height)
+        surface.fill((0, 0, 0), panel)
+
+        last = self.frames[-1] if self.frames else {}
+        lines = [f"FPS: {self.fps():.1f}"]
+        lines.append("  ".join(f"{key}: {value}" for key, value in self.counters.items()
+                               if not isinstance(value, float)) or " ")
+        phases = [(key, value) for key, value in last.items() if key not in ("frame", "time")
+                  and isinstance(value, float)]
+        lines.append(" ".join(f"{key[:6]} {value * 1000:.1f}" for key, value in phases) or " ")
+        for i, line in enumerate(lines):
+            text = self._font.render(line, True, (255, 255, 255))
+            surface.blit(text, (panel.x + 5, panel.y + 5 + i * 16))
+
+        # Graphe : une barre par frame, la ligne rouge marque 16,7 ms (60 FPS)
+        graph_bottom = panel.bottom - 5
+        scale = 40 / (1 / 30)  # 40 pixels = 33 ms
+        x = panel.x + 5
+        for frame in list(self.frames)[-(width - 10):]:
+            bar = min(40, int(frame["time"] * scale))
+            color = (0, 200, 0) if frame["time"] <= 1 / 60 else (230, 160, 0)
+            pygame.draw.line(surface, color, (x, graph_bottom), (x, graph_bottom - bar))
+            x += 1
+        limit = graph_bottom - int(scale / 60)
+        pygame.draw.line(surface, (200, 0, 0), (panel.x + 5, limit), (panel.right - 5, limit))
+
+    def close(self):
+        if self._export is not None:
+            self._export.close()
+            self._export = None
@@ -0,0 +1,143 @@
+"""Affichage des sprites par-dessus la carte pyscroll.
+
+Les sprites hors de la vue de la caméra (zoom compris) sont éliminés avant
+tout calcul, les autres sont triés par calque puis par profondeur (bas du
+rectangle) et transmis en une seule liste au renderer, qui les dessine avec
+les tuiles qui les recouvrent en un seul appel à Surface.blits.
+
+Avec un zoom pré-calculé (ScaledMapData), tuiles et images des sprites
+sont agrandies une fois pour toutes : le renderer travaille directement à
+la résolution de l'écran, sans redimensionner toute l'image à chaque frame.
+"""
+import math
+
+import pygame
+import pyscroll
+
+from sprites import scaled
+
+
+class ScaledMapData(pyscroll.data.PyscrollDataAdapter):
+    """Source pyscroll dont les tuiles sont agrandies au facteur ``scale`` et mises en cache"""
+
+    def __init__(self, data, scale):
+        super().__init__()
+        self.data = data
+        self.scale = scale
+        self._tiles = {}
+        self.reload_animations()
+
+    @staticmethod
+    def supports(data, scale):
+        """Vrai si ``data`` peut être agrandie : tuiles entières et pas de tuiles animées"""
+        tw, th = data.tile_size
+        return (tw * scale).is_integer() and (th * scale).is_integer() and not any(True for _ in data.get_animations())
+
+    @property
+    def tile_size(self):
+        tw, th = self.data.tile_size
+        return int(tw * self.scale), int(th * self.scale)
+
+    @property
+    def map_size(self):
+        return self.data.map_size
+
+    @property
+    def visible_tile_layers(self):
+        return self.data.visible_tile_layers
+
+    def reload_data(self):
+        self.data.reload_data()
+        self._tiles.clear()
+
+    def get_animations(self):
+        return ()
+
+    def convert_surfaces(self, parent, alpha=False):
+        self.data.convert_surfaces(parent, alpha)
+        self._tiles.clear()
+
+    def scaled_tile(self, image):
+        tile = self._tiles.get(image)
+        if tile is None:
+            tile = pygame.transform.scale(image, (round(image.get_width() * self.scale),
+                                                  round(image.get_height() * self.scale)))
+            self._tiles[image] = tile
+        return tile
+
+    def prepare(self):
+        """Agrandit d'avance toutes les tuiles de la carte"""
+        width, height = self.map_size
+        for _, _, _, image in self.data.get_tile_images_by_rect(pygame.Rect(0, 0, width, height)):
+            self.scaled_tile(image)
+
+    def _get_tile_image(self, x, y, l):
+        image = self.data.get_tile_image(x, y, l)
+        return self.scaled_tile(image) if image else None
+
+    def get_tile_images_by_rect(self, rect):
+        scaled_tile = self.scaled_tile
+        for x, y, l, image in self.data.get_tile_images_by_rect(rect):
+            yield x, y, l, scaled_tile(image)
+
+
+class CameraGroup(pyscroll.PyscrollGroup):
+    """PyscrollGroup qui ne dessine que les sprites visibles, triés en profondeur.
+
+    ``scale`` est le zoom pré-calculé de la carte : positions et images des
+    sprites (en coordonnées du monde) y sont ramenées au moment du dessin.
+    """
+
+    def __init__(self, map_layer, *args, scale=1, **kwargs):
+        super().__init__(map_layer, *args, **kwargs)
+        self.scale = scale
+        self.drawn = 0
+        self.culled = 0
+
+    def center(self, value):
+        self._map_layer.center((value[0] * self.scale, value[1] * self.scale))
+
+    @property
+    def view(self):
+        """Partie visible de la carte, en coordonnées du monde"""
+        view = self._map_layer.view_rect
+        if self.scale == 1:
+            return view.copy()
+        left, top = math.floor(view.left / self.scale), math.floor(view.top / self.scale)
+        return pygame.Rect(left, top, math.ceil(view.right / self.scale) - left,
+                           math.ceil(view.bottom / self.scale) - top)
+
+    def visible_sprites(self):
+        """Sprites dont le rectangle touche la vue de la caméra"""
+        sprites = self.sprites()
+        # Un seul test en C pour tous les sprites
+        visible = [sprites[i] for i in self.view.collidelistall([sprite.rect for sprite in sprites])]
+        self.drawn = len(visible)
+        self.culled = len(sprites) - len(visible)
+        return visible
+
+    def draw(self, surface):
+        ox, oy = self._map_layer.get_center_offset()
+        scale = self.scale
+        get_layer = self.get_layer_of_sprite
+        visible = self.visible_sprites()
+        visible.sort(key=lambda sprite: (get_layer(sprite), sprite.rect.bottom))
+
+        # pyscroll trie ses blits par calque puis par x : un calque fractionnaire
+        # (calque + rang / n) lui impose l'ordre de profondeur calculé ici
+        step = 1.0 / (len(visible) + 1)
+        surfaces = []
+        spritedict = self.spritedict
+        for rank, sprite in enumerate(visible, 1):
+            if scale == 1:
+                image = sprite.image
+                rect = sprite.rect.move(ox, oy)
+            else:
+                image = scaled(sprite.image, scale)
+                rect = image.get_rect(topleft=(round(sprite.rect.x * scale) + ox,
+                                               round(sprite.rect.y * scale) + oy))
+            surfaces.append((image, rect, get_layer(sprite) + rank * step))
+            spritedict[sprite] = rect
+
+        self.lostsprites = []
+        return self._map_layer.draw(surface, surface.get_rect(), surfaces)
@@ -0,0 +1,154 @@
+"""Enregistrement et relecture déterministe des parties.
+
+Un fichier .rpl contient un en-tête JSON (carte de départ, graine, cadence
+de simulation, mode de collision, état final attendu) suivi d'un octet par
+pas de simulation : les directions demandées et l'action « interact », le
+tout compressé par zlib. L'horloge
+de la partie avance de 1/sim_rate par pas, si bien que relire ces octets
+avec les mêmes paramètres redonne exactement la même partie, sans fenêtre
+et aussi vite que la machine le permet.
+
+Exemple :
+    python main.py --record route.rpl
+    python replay.py route.rpl
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import pygame
+
+MAGIC = b"AVRP"
+VERSION = 1
+PREFIX = struct.Struct("<4sHI")  # magic, version, taille de l'en-tête JSON
+
+# Une action de déplacement par bit de l'octet enregistré à chaque pas
+# (les touches qui y sont associées peuvent changer, voir controls.py)
+ACTION_BITS = {
+    "up": 1,
+    "down": 2,
+    "left": 4,
+    "right": 8,
+}
+# « interact » est un appui, pas une touche tenue : le bit indique que
+# Game.interact a été appelé au début du pas
+INTERACT_BIT = 16
+
+
+def encode_state(state, interact=False):
+    """Résume un état des commandes (indexable par action) en un octet"""
+    bits = INTERACT_BIT if interact else 0
+    for action, bit in ACTION_BITS.items():
+        if state[action]:
+            bits |= bit
+    return bits
+
+
+class KeyState:
+    """État des commandes relu, utilisable comme controls.Controls"""
+    __slots__ = ("bits",)
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    def __getitem__(self, action):
+        return bool(self.bits & ACTION_BITS.get(action, 0))
+
+
+class InputRecorder:
+    """Note les commandes de chaque pas de simulation d'une partie"""
+
+    def __init__(self, path, **settings):
+        self.path = path
+        self.settings = settings
+        self.inputs = bytearray()
+
+    def record(self, state, interact=False):
+        self.inputs.append(encode_state(state, interact))
+
+    def save(self, game=None):
+        """Écrit l'enregistrement ; l'état final de ``game`` sert de référence à la relecture"""
+        header = dict(self.settings, steps=len(self.inputs))
+        if game is not None:
+            header["final"] = final_state(game)
+        data = json.dumps(header).encode("utf-8")
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(data)))
+            f.write(data)
+            f.write(zlib.compress(bytes(self.inputs), 9))
+        os.replace(tmp_path, self.path)
+
+
+def load(path):
+    """Renvoie l'en-tête et les touches (un octet par pas) d'un enregistrement"""
+    with open(path, "rb") as f:
+        magic, version, size = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} : format d'enregistrement inconnu")
+        header = json.loads(f.read(size))
+        inputs = zlib.decompress(f.read())
+    if len(inputs) != header["steps"]:
+        raise ValueError(f"{path} : enregistrement tronqué")
+    return header, inputs
+
+
+def final_state(game):
+    return {
+        "map": game.current_map,
+        "position": list(game.player.position),
+        "sim_time": game.sim_time,
+        "game_over": game.game_over,
+        "level_completed": game.level_completed,
+        "chests": sorted(list(key) for key in game.opened_chests),
+    }
+
+
+def replay(path, draw=False):
+    """Rejoue un enregistrement sans fenêtre et renvoie la partie dans son état final"""
+    from game import Game
+
+    header, inputs = load(path)
+    game = Game(collision_mode=header["collision_mode"], sim_rate=header["sim_rate"],
+                headless=True, start_map=header["start_map"], seed=header["seed"], deterministic=True)
+    dt = 1.0 / game.sim_rate
+    for bits in inputs:
+        game.player.save_location()
+        if bits & INTERACT_BIT:
+            game.interact()
+        game.handle_input(dt, KeyState(bits))
+        game.update(dt)
+        if draw:
+            game.draw()
+    return game, header
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relit une partie enregistrée")
+    parser.add_argument("path", help="fichier .rpl")
+    parser.add_argument("--draw", action="store_true", help="fait aussi l'affichage (hors écran)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    game, header = replay(args.path, args.draw)
+    elapsed = time.perf_counter() - start
+    state = final_state(game)
+    pygame.quit()
+
+    print(f"{header['steps']} pas ({state['sim_time']:.2f} s de jeu) rejoués en {elapsed:.2f} s")
+    print(f"carte {state['map']}, joueur en {state['position']}")
+    expected = header.get("final")
+    # Comparaison limitée aux valeurs notées par l'enregistrement (les anciens n'ont pas les coffres)
+    if expected is not None and expected != {key: state.get(key) for key in expected}:
+        print(f"état final différent de l'enregistrement : {expected}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
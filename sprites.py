@@ -0,0 +1,54 @@
+import pygame
+
+# Caches partagés par tout le processus
+_sheets = {}
+_scaled = {}
+
+
+def load_sheet(path):
+    """Charge une feuille de sprites une seule fois"""
+    sheet = _sheets.get(path)
+    if sheet is None:
+        sheet = pygame.image.load(path)
+        if pygame.display.get_surface() is not None:
+            sheet = sheet.convert_alpha()
+        _sheets[path] = sheet
+    return sheet
+
+
+def scaled(image, scale):
+    """Image agrandie au facteur ``scale``, calculée une seule fois"""
+    key = (image, scale)
+    result = _scaled.get(key)
+    if result is None:
+        size = (round(image.get_width() * scale), round(image.get_height() * scale))
+        result = pygame.transform.scale(image, size)
+        _scaled[key] = result
+    return result
+
+
+def prescale(images, scale):
+    """Prépare les images agrandies de ``images`` (par exemple toutes celles de l'atlas)"""
+    for image in images:
+        scaled(image, scale)
+
+
+class Chest(pygame.sprite.Sprite):
+    """Coffre posé sur la carte (objet tmx de type « coffre ») : fermé, puis ouvert"""
+
+    SHEET = "ressources/Chest.png"
+
+    def __init__(self, x, y, opened=False):
+        super().__init__()
+        from animation import library
+        self.animation = library().character(self.SHEET)  # Clips « closed » et « open » de Chest.anim
+        self.opened = opened
+        self.image = self.animation.images("open" if opened else "closed")[0]
+        self.rect = self.image.get_rect(topleft=(x, y))
+
+    def open(self):
+        self.opened = True
+        self.image = self.animation.images("open")[0]
+
+    def interpolate(self, alpha):
+        pass  # Immobile
@@ -0,0 +1,100 @@
+"""Tests du balayage des déplacements contre les murs (collisions.sweep)"""
+import pygame
+import pytest
+
+from collisions import SpatialHash, TileCollisionMap, sweep
+
+
+def make_index(*walls):
+    index = SpatialHash(cell_size=64)
+    for wall in walls:
+        index.add(pygame.Rect(wall))
+    return index
+
+
+def test_free_movement():
+    assert sweep((10, 10, 8, 8), 3.5, -2.25, make_index()) == (13.5, 7.75, False)
+
+
+def test_no_movement():
+    assert sweep((10, 10, 8, 8), 0, 0, make_index((18, 10, 16, 16))) == (10, 10, False)
+
+
+def test_diagonal_steps_never_blocked_in_empty_space():
+    index = make_index()
+    x, y = 100.0, 100.0
+    step = 180 * 0.7071067811865476 / 60
+    for _ in range(800):
+        x, y, blocked = sweep((x, y, 20, 12), step, -step, index)
+        assert not blocked
+
+
+def test_slides_along_wall():
+    # Mur vertical à droite : x s'arrête au contact, y continue
+    x, y, blocked = sweep((0, 0, 10, 10), 8, 5, make_index((15, -50, 10, 200)))
+    assert (x, y, blocked) == (5, 5, True)
+
+
+def test_slides_along_floor():
+    x, y, blocked = sweep((0, 0, 10, 10), -4, 7.5, make_index((-50, 12, 200, 10)))
+    assert (x, y, blocked) == (-4, 2, True)
+
+
+def test_exact_contact_is_not_blocked():
+    index = make_index((20, 0, 10, 10))
+    assert sweep((0, 0, 10, 10), 10, 0, index) == (10, 0, False)
+    # Au contact, avancer encore est bloqué sur place
+    assert sweep((10, 0, 10, 10), 3, 0, index) == (10, 0, True)
+    # S'éloigner ou longer le mur ne l'est pas
+    assert sweep((10, 0, 10, 10), -3, 0, index) == (7, 0, False)
+    assert sweep((10, 0, 10, 10), 0, 4, index) == (10, 4, False)
+
+
+def test_overlapping_wall_is_ignored():
+    assert sweep((0, 0, 10, 10), 4, 0, make_index((5, 0, 10, 10))) == (4, 0, False)
+
+
+@pytest.mark.parametrize("dx, dy, expected", [
+    (500, 0, (90, 0)),
+    (-500, 0, (-198, 0)),
+    (0, 500, (0, 90)),
+    (0, -500, (0, -198)),
+])
+def test_no_tunnelling_at_high_speed(dx, dy, expected):
+    # Murs fins (2 px) bien plus courts que le déplacement du pas
+    index = make_index((100, -10, 2, 30), (-200, -10, 2, 30), (-10, 100, 30, 2), (-10, -200, 30, 2))
+    assert sweep((0, 0, 10, 10), dx, dy, index) == expected + (True,)
+
+
+def test_stops_at_first_wall():
+    index = make_index((300, 0, 10, 10), (50, 0, 10, 10), (150, 0, 10, 10))
+    assert sweep((0, 0, 10, 10), 1000, 0, index) == (40, 0, True)
+
+
+def tile_map(*walls, width=16, height=16):
+    bitmap = TileCollisionMap(width, height, 16, 16)
+    for tx, ty in walls:
+        bitmap.set_wall(tx, ty)
+    return bitmap
+
+
+def test_tile_map_slides_along_wall():
+    bitmap = tile_map(*((4, ty) for ty in range(16)))
+    assert sweep((40, 40, 12, 8), 20, 6, bitmap) == (52, 46, True)
+
+
+def test_tile_map_exact_contact():
+    bitmap = tile_map((4, 2))
+    assert sweep((40, 32, 12, 8), 12, 0, bitmap) == (52, 32, False)
+    assert sweep((52, 32, 12, 8), 1, 0, bitmap) == (52, 32, True)
+
+
+def test_tile_map_no_tunnelling():
+    bitmap = tile_map((10, 2))
+    assert sweep((16, 32, 12, 12), 400, 0, bitmap) == (148, 32, True)
+
+
+def test_tile_map_edges_are_walls():
+    bitmap = tile_map()
+    assert sweep((4, 4, 8, 8), -50, -50, bitmap) == (0, 0, True)
+    assert sweep((240, 240, 8, 8), 50, 50, bitmap) == (248, 248, True)
@@ -0,0 +1,69 @@
+"""Tests des niveaux compilés (levelcache) : fidélité au tmx et invalidation du .lvl"""
+import os
+import shutil
+
+import pygame
+import pytest
+
+import levelcache
+from levels import CompiledLevel, Level
+
+
+@pytest.fixture
+def tmx(tmp_path):
+    """Copie de map.tmx et de ses sources : le .lvl est écrit à côté du tmx"""
+    for dep in levelcache.dependencies("map.tmx"):
+        os.makedirs(tmp_path / os.path.dirname(dep), exist_ok=True)
+        shutil.copy2(dep, tmp_path / dep)
+    if pygame.display.get_surface() is None:
+        pygame.display.init()
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    return str(tmp_path / "map.tmx")
+
+
+def test_compiled_level_matches_tmx(tmx):
+    level = Level(tmx)
+    compiled = CompiledLevel(tmx, levelcache.compile_level(tmx))
+    assert compiled.map_data.map_size == level.map_data.map_size
+    assert compiled.walls == level.walls
+    assert compiled.wall_bitmap.cells == level.wall_bitmap.cells
+    assert compiled.spawn == level.spawn
+    assert [(p.name, p.rect, p.target_map) for p in compiled.portals] == \
+           [(p.name, p.rect, p.target_map) for p in level.portals]
+    # Mêmes tuiles présentes dans chaque calque (les gid sont renumérotés dans l'atlas)
+    for layer in level.tmx_data.visible_tile_layers:
+        expected = [bool(gid) for row in level.tmx_data.layers[layer].data for gid in row]
+        assert [bool(gid) for gid in compiled.tmx_data.layers[layer]] == expected
+
+
+def test_fresh_cache_is_used(tmx):
+    path = levelcache.compile_level(tmx)
+    assert levelcache.find_compiled(tmx) == path
+
+
+def test_touched_sources_refresh_dates(tmx):
+    path = levelcache.compile_level(tmx)
+    mtime = os.path.getmtime(tmx) + 10
+    os.utime(tmx, (mtime, mtime))
+
+    # Contenu identique : le .lvl sert toujours et note la nouvelle date
+    assert levelcache.find_compiled(tmx) == path
+    assert levelcache.read_header(path)["deps"][os.path.normpath(tmx)] == mtime
+
+
+def test_modified_sources_reject_cache(tmx, capsys):
+    levelcache.compile_level(tmx)
+    with open(tmx, "a") as f:
+        f.write("\n")
+    mtime = os.path.getmtime(tmx) + 10
+    os.utime(tmx, (mtime, mtime))
+
+    assert levelcache.find_compiled(tmx) is None
+    assert "périmé" in capsys.readouterr().out
+
+
+def test_truncated_cache_is_rejected(tmx):
+    path = levelcache.compile_level(tmx)
+    with open(path, "r+b") as f:
+        f.truncate(4)
+    assert levelcache.find_compiled(tmx) is None
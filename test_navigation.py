@@ -0,0 +1,94 @@
+"""Tests de la recherche de chemin (navigation) : A* sur une petite grille et cache du PathService"""
+import pygame
+import pytest
+
+from levels import Level
+from navigation import NavGrid, PathService
+
+
+def grid_from(rows):
+    """Grille à partir de lignes de texte : « # » = mur"""
+    blocked = bytearray(1 if c == "#" else 0 for row in rows for c in row)
+    return NavGrid(len(rows[0]), len(rows), 16, blocked)
+
+
+def test_straight_path():
+    grid = grid_from(["....."])
+    assert grid.find_path((0, 0), (4, 0)) == [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)]
+
+
+def test_path_goes_around_wall():
+    grid = grid_from([
+        ".#...",
+        ".#.#.",
+        "...#.",
+    ])
+    path = grid.find_path((0, 0), (4, 0))
+    assert path[0] == (0, 0) and path[-1] == (4, 0)
+    assert len(path) == 9  # Plus court chemin : descendre, passer sous le premier mur, remonter
+    assert all(grid.walkable(*cell) for cell in path)
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        assert abs(x1 - x0) + abs(y1 - y0) == 1
+
+
+def test_no_path():
+    grid = grid_from([
+        "..#..",
+        "..#..",
+    ])
+    assert grid.find_path((0, 0), (4, 1)) is None
+    assert grid.find_path((2, 0), (4, 1)) is None  # Départ dans un mur
+
+
+def test_nearest_walkable_and_inflated():
+    grid = grid_from([
+        "...",
+        ".#.",
+        "...",
+    ])
+    assert grid.nearest_walkable((1, 1)) == (0, 0)
+    assert not any(grid.inflated(1, 1).walkable(x, y) for x in range(3) for y in range(3))
+
+
+@pytest.fixture
+def level():
+    if pygame.display.get_surface() is None:
+        pygame.display.init()
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    return Level("map.tmx")
+
+
+def open_corridor(grid, length=9):
+    """Première suite horizontale de ``length`` cases libres, avec des cases libres au-dessus et en dessous"""
+    for y in range(1, grid.height - 1):
+        for x in range(grid.width - length):
+            if all(grid.walkable(x + i, y + dy) for i in range(length) for dy in (-1, 0, 1)):
+                return (x, y), (x + length - 1, y)
+    raise AssertionError("pas de couloir libre")
+
+
+def test_cache_dropped_after_add_wall(level):
+    service = PathService()
+    try:
+        service.set_level(level)
+        grid = NavGrid.from_level(level)
+        start, goal = (grid.center(cell) for cell in open_corridor(grid))
+
+        path = service.find_path(start, goal)
+        assert path[0] == start and path[-1] == goal
+        assert service.find_path(start, goal) == path  # Servi par le cache
+        assert len(service._cache) == 1
+
+        # Mur en travers du chemin : grille et cache refaits, le nouveau chemin le contourne
+        middle = path[len(path) // 2]
+        wall = pygame.Rect(middle[0] - 8, middle[1] - 8, 16, 16)
+        level.add_wall(wall)
+        detour = service.find_path(start, goal)
+        assert detour != path and detour[0] == start and detour[-1] == goal
+        assert not any(wall.collidepoint(point) for point in detour)
+
+        # Mur retiré : le chemin direct revient
+        level.remove_wall(wall)
+        assert service.find_path(start, goal) == path
+    finally:
+        service.shutdown()
@@ -0,0 +1,89 @@
+"""Tests de l'enregistrement et de la relecture des parties (replay)"""
+import zlib
+
+import pytest
+
+import replay
+from game import Game
+from headless import ScriptedKeys
+from navigation import NavGrid
+
+SEED = 3
+CHEST_FRONT = (64, 592)  # Juste sous le coffre de map.tmx
+
+
+def record_step(game, recorder, actions=(), interact=False):
+    """Un pas de simulation comme dans Game.run, enregistré"""
+    game.player.save_location()
+    if interact:
+        game.interact()
+    pressed = ScriptedKeys(actions) if game.dialog is None else ScriptedKeys()
+    recorder.record(pressed, interact)
+    game.handle_input(1 / game.sim_rate, pressed)
+    game.update(1 / game.sim_rate)
+
+
+def walk_to(game, recorder, target, tolerance=3):
+    """Suit le plus court chemin (grille de 4 px épaissie à la taille des pieds) jusqu'à ``target``"""
+    feet = game.player.feet
+    grid = NavGrid.from_level(game.level, cell_size=4).inflated(-(-feet.width // 8), -(-feet.height // 8))
+    cells = grid.find_path(grid.nearest_walkable(grid.cell_at(feet.center)),
+                           grid.nearest_walkable(grid.cell_at(target)))
+    path = [grid.center(cell) for cell in cells]
+    for _ in range(2000):
+        x, y = game.player.feet.center
+        while path and abs(path[0][0] - x) <= tolerance and abs(path[0][1] - y) <= tolerance:
+            path.pop(0)
+        if not path:
+            return
+        dx, dy = path[0][0] - x, path[0][1] - y
+        if abs(dx) > tolerance:
+            record_step(game, recorder, ["right" if dx > 0 else "left"])
+        else:
+            record_step(game, recorder, ["down" if dy > 0 else "up"])
+    raise AssertionError(f"{target} pas atteint")
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / "partie.rpl")
+    game = Game(headless=True, seed=SEED, deterministic=True)
+    recorder = replay.InputRecorder(path, start_map="map.tmx", seed=SEED, sim_rate=game.sim_rate,
+                                    collision_mode=game.collision_mode)
+    walk_to(game, recorder, CHEST_FRONT)
+    record_step(game, recorder, interact=True)  # Ouvre le coffre
+    for _ in range(20):
+        record_step(game, recorder)
+    record_step(game, recorder, interact=True)
+    for _ in range(20):
+        record_step(game, recorder, ["right", "up"])
+    recorder.save(game)
+    return path, replay.final_state(game)
+
+
+def test_interact_bit():
+    assert replay.encode_state(ScriptedKeys(["left"]), interact=True) == replay.ACTION_BITS["left"] | replay.INTERACT_BIT
+    assert not replay.KeyState(replay.INTERACT_BIT)["up"]
+
+
+def test_replay_reproduces_final_state(recording):
+    path, expected = recording
+    assert expected["chests"] == [["map.tmx", "coffre_foret"]]
+
+    header, inputs = replay.load(path)
+    assert header["final"] == expected
+    assert len(inputs) == header["steps"]
+
+    game, _ = replay.replay(path)
+    assert replay.final_state(game) == expected
+    assert replay.main([path]) == 0
+
+
+def test_load_rejects_truncated_recording(recording):
+    path, _ = recording
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-8])
+    with pytest.raises((ValueError, zlib.error)):
+        replay.load(path)
@@ -0,0 +1,65 @@
+"""Tests du format de sauvegarde (savegame) : aller-retour des octets et reprise de partie"""
+import json
+
+import numpy as np
+import pytest
+
+import savegame
+from game import Game
+from headless import ScriptedKeys
+
+DT = 1 / 60
+
+
+def play(game, steps, actions):
+    for _ in range(steps):
+        game.player.save_location()
+        game.handle_input(DT, ScriptedKeys(actions))
+        game.update(DT)
+
+
+def state(game):
+    store = game.entities
+    npcs = {npc.name: (float(store.x[i]), float(store.y[i])) for i, npc in game.npcs.items()}
+    return game.current_map, list(game.player.position), npcs, game.sim_time, sorted(game.opened_chests)
+
+
+@pytest.fixture
+def game():
+    game = Game(headless=True, seed=3, deterministic=True)
+    play(game, 100, ["right"])
+    play(game, 60, ["down"])
+    game.opened_chests.add(("map.tmx", "coffre_foret"))
+    return game
+
+
+def test_encode_decode_round_trip(game):
+    snapshot = savegame.capture(game)
+    decoded = savegame.decode(savegame.encode(snapshot))
+    assert decoded.header == json.loads(json.dumps(snapshot.header))  # En-tête JSON : tuples relus en listes
+    assert list(decoded.columns) == list(snapshot.columns)
+    for name, values in snapshot.columns.items():
+        assert decoded.columns[name].dtype == values.dtype
+        np.testing.assert_array_equal(decoded.columns[name], values)
+
+
+def test_decode_rejects_unknown_data():
+    with pytest.raises(ValueError):
+        savegame.decode(b"AVSV")
+    with pytest.raises(ValueError):
+        savegame.decode(b"XXXX" + bytes(16))
+
+
+def test_restore_then_play_matches_original(game, tmp_path):
+    path = str(tmp_path / "partie.sav")
+    savegame.write(path, savegame.capture(game))
+
+    restored = Game(headless=True, seed=99, deterministic=True)
+    savegame.restore(restored, savegame.read(path))
+    assert state(restored) == state(game)
+
+    # La partie reprise évolue exactement comme celle qui a continué
+    play(game, 240, ["left", "up"])
+    play(restored, 240, ["left", "up"])
+    assert state(restored) == state(game)
+    assert restored.chests["coffre_foret"].opened
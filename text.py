@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+
+class TextCache:
+    """Cache LRU des surfaces de texte rendues.
+
+    Partagé par le HUD, les écrans de fin et les menus : un même texte
+    n'est rendu qu'une fois tant qu'il reste parmi les ``max_size`` plus
+    récemment utilisés.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        """Équivalent de font.render, avec mise en cache"""
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+
+        surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+class HudText:
+    """Élément de HUD qui ne refait son rendu que lorsque sa valeur change"""
+
+    def __init__(self, cache, font, template, color, **anchor):
+        self.cache = cache
+        self.font = font
+        self.template = template
+        self.color = color
+        self.anchor = anchor
+        self.value = None
+        self.surface = None
+        self.rect = None
+
+    def set_value(self, value):
+        if value == self.value and self.surface is not None:
+            return
+        self.value = value
+        self.surface = self.cache.render(self.font, self.template.format(value), self.color)
+        self.rect = self.surface.get_rect(**self.anchor)
+
+    def draw(self, surface, value):
+        self.set_value(value)
+        surface.blit(self.surface, self.rect)
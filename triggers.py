@@ -0,0 +1,100 @@
+"""Volumes déclencheurs : portails, objectifs, coffres, panneaux...
+
+Les volumes d'un niveau sont rangés dans son index spatial (genre
+« trigger »). Pour chaque entité suivie, le système garde les cases de
+l'index que recouvrent ses pieds et les volumes rangés dans ces cases : la
+liste n'est refaite que lorsque l'entité change de case, et tant qu'elle
+reste dans des cases sans volume, son pas ne coûte qu'une comparaison de
+tuples. Les rappels ``enter`` et ``exit`` ne sont appelés qu'à l'entrée et à
+la sortie d'un volume ; ``interact`` vise les volumes où se trouve déjà
+l'entité (touche « interact » du joueur), sans aucun test supplémentaire.
+"""
+
+
+class Trigger:
+    """Volume déclencheur : un rectangle, un genre (« portal », « coffre »...) et l'objet associé"""
+
+    def __init__(self, name, kind, rect, item=None):
+        self.name = name
+        self.kind = kind
+        self.rect = rect
+        self.item = item  # Portail, objet tmx (avec ses propriétés)...
+
+    @property
+    def properties(self):
+        return getattr(self.item, "properties", {})
+
+
+class TriggerSystem:
+    """Suivi des entités dans les volumes déclencheurs du niveau courant.
+
+    Les rappels sont enregistrés par genre de volume avec ``on`` et reçoivent
+    (volume, entité) ; un rappel qui renvoie True met fin au pas (changement
+    de carte, fin de niveau) : les événements suivants ne sont pas envoyés.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.handlers = {}  # genre -> {"enter": rappel, "exit": ..., "interact": ...}
+        self._cells = {}    # entité -> cases de l'index recouvertes
+        self._nearby = {}   # entité -> volumes rangés dans ces cases
+        self._inside = {}   # entité -> volumes où elle se trouve
+
+    def on(self, kind, enter=None, exit=None, interact=None):
+        self.handlers[kind] = {"enter": enter, "exit": exit, "interact": interact}
+
+    def set_level(self, level):
+        """Change de niveau : les entités ne sont plus dans aucun volume"""
+        self.index = level.index
+        self._cells.clear()
+        self._nearby.clear()
+        self._inside.clear()
+
+    def forget(self, entity):
+        """Oublie une entité (disparue), sans rappel de sortie"""
+        self._cells.pop(entity, None)
+        self._nearby.pop(entity, None)
+        self._inside.pop(entity, None)
+
+    def inside(self, entity):
+        """Volumes où se trouve l'entité"""
+        return self._inside.get(entity, [])
+
+    def update(self, entity, rect):
+        """Place l'entité (rectangle de ses pieds) ; renvoie True si un rappel a mis fin au pas"""
+        size = self.index.cell_size
+        cells = (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+        if cells != self._cells.get(entity):
+            self._cells[entity] = cells
+            self._nearby[entity] = self.index.query(rect, "trigger")
+        nearby = self._nearby[entity]
+        inside = self._inside.get(entity)
+        if not nearby and not inside:
+            return False
+
+        now = [trigger for trigger in nearby if rect.colliderect(trigger.rect)]
+        if now == inside:
+            return False
+        previous = inside or []
+        self._inside[entity] = now
+        # Sorties puis entrées ; un rappel peut changer de niveau et vider l'état
+        for trigger in previous:
+            if trigger not in now and self._dispatch("exit", trigger, entity):
+                return True
+        for trigger in now:
+            if trigger not in previous and self._dispatch("enter", trigger, entity):
+                return True
+        return False
+
+    def interact(self, entity):
+        """Interaction avec les volumes où se trouve l'entité ; renvoie True si l'un d'eux a réagi"""
+        for trigger in self.inside(entity):
+            handler = self.handlers.get(trigger.kind, {}).get("interact")
+            if handler is not None:
+                handler(trigger, entity)
+                return True
+        return False
+
+    def _dispatch(self, event, trigger, entity):
+        handler = self.handlers.get(trigger.kind, {}).get(event)
+        return handler is not None and bool(handler(trigger, entity))